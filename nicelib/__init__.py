@@ -8,6 +8,7 @@ import logging
 from importlib import import_module
 
 from .__about__ import __version__
+from .util import suppress, LazyDefs
 
 log = logging.getLogger(__name__)
 
@@ -19,21 +20,29 @@ class LibInfo(object):
         if lib_module:
             self._ffi = lib_module.ffi
             self._ffilib = lib_module.lib
-            self._defs = lib_module.defs
-            self.__dict__.update(self._defs)
+            self._defs = LazyDefs(getattr(lib_module, 'def_srcs', {}), vars(lib_module),
+                                  getattr(lib_module, 'defs', {}))
             self._argnames = getattr(lib_module, 'argnames', {})
             self._build_version = lib_module.build_version
+            self._api_mode = getattr(lib_module, 'api_mode', False)
+            self._symbol_kinds = getattr(lib_module, 'symbols', None)
         else:
             self._ffi = None
             self._ffilib = None
             self._defs = None
             self._argnames = {}
+            self._api_mode = False
+            self._symbol_kinds = None
+        self._symbols = None  # SymbolIndex, built on first use
 
     def __getattr__(self, name):
+        defs = self.__dict__.get('_defs')
+        if defs and name in defs:
+            return defs[name]  # Evaluated on first lookup
         return getattr(self._ffilib, name)
 
 
-def load_lib(name, pkg=None, dir=None, builder=None, kwargs={}):
+def load_lib(name, pkg=None, dir=None, builder=None, kwargs={}, api_mode=None):
     """Load a low-level lib module, building it first if required.
 
     If ``name`` is ``'foo'``, tries to import a module named ``_foolib``. If the module can't be located,
@@ -53,6 +62,12 @@ def load_lib(name, pkg=None, dir=None, builder=None, kwargs={}):
         default, it is assumed to be ``_build_foo`` (where 'foo' is the value of ``name``).
     kwargs : dict, optional
         Keyword args to be passed to ``build()``.
+    api_mode : bool, optional
+        If given, overrides the default ``api_mode`` of any `build_lib()` call made by ``build()``,
+        i.e. whether to compile an API-mode extension module. See `build_lib()`. This only applies
+        to calls made in the current thread, and calls that pass ``api_mode`` themselves are
+        unaffected. It has no effect if the module has already been built: to switch modes,
+        delete the built module first.
 
     Returns
     -------
@@ -72,16 +87,42 @@ def load_lib(name, pkg=None, dir=None, builder=None, kwargs={}):
             builder = prefix + '_build_{}'.format(name)
         log.info('Loading build module %s from %s...', builder, pkg)
         build_module = import_module(builder, pkg)
-        build_module.build(**kwargs)
+        if api_mode is None:
+            build_module.build(**kwargs)
+        else:
+            from .build import api_mode_override
+            with api_mode_override(api_mode):
+                build_module.build(**kwargs)
         lib_module = import_module(lib_name, pkg)
 
-    return LibInfo(lib_module)
+    # Share one LibInfo (and its symbol index) between all the wrappers that load this module
+    with suppress(AttributeError):
+        return lib_module._lib_info
+    lib_module._lib_info = info = LibInfo(lib_module)
+    return info
 
 
 from .nicelib import (NiceLib, NiceObjectDef, NiceObject, RetHandler, ret_return, ret_ignore,
                       Sig, sig_pattern)
-from .build import build_lib
-from .process import generate_bindings
+
+# The build machinery (pycparser, PLY, cffi's parser) is only needed when building a lib, so on
+# Python 3.7+ it's only imported when first used
+_LAZY_ATTRS = {'build_lib': '.build', 'generate_bindings': '.process'}
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        try:
+            module_name = _LAZY_ATTRS[name]
+        except KeyError:
+            raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+        value = globals()[name] = getattr(import_module(module_name, __name__), name)
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(_LAZY_ATTRS))
+else:
+    from .build import build_lib
+    from .process import generate_bindings
 
 __all__ = ['NiceLib', 'NiceObjectDef', 'build_lib', 'load_lib', 'generate_bindings', 'NiceObject',
            'RetHandler', 'ret_return', 'ret_ignore', 'Sig', 'sig_pattern', '__version__']
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Awaitable versions of NiceLib functions and NiceObject methods, for use with asyncio
+
+This module requires Python 3.7+. It is imported on first use of a ``.aio`` attribute, e.g.::
+
+    result = await NiceFoo.aio.add(1, 2)
+    value = await item.aio.get_value()
+
+Each call is run in an executor so that blocking C calls don't stall the event loop.
+"""
+import asyncio
+from functools import partial
+from weakref import WeakKeyDictionary, proxy
+
+
+class Limiter(object):
+    """Limit on the number of concurrent calls, shared by everything it's attached to
+
+    Semaphores belong to a single event loop, so one is created for each loop that uses it.
+    """
+    def __init__(self, limit):
+        self.limit = limit
+        self._semaphores = WeakKeyDictionary()
+
+    @property
+    def semaphore(self):
+        loop = asyncio.get_running_loop()
+        try:
+            return self._semaphores[loop]
+        except KeyError:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.limit)
+            return semaphore
+
+
+class AioNamespace(object):
+    """Namespace of awaitable versions of the functions of a NiceLib or methods of a NiceObject
+
+    Attribute lookups are resolved against `target`, and the resulting coroutine functions are
+    cached. Calls acquire each of `limiters` in order, then run in the parent lib's
+    ``_aio_executor_`` (the loop's default executor if None). The limiters are held until the call
+    itself has finished, even if the awaiting task is cancelled first.
+
+    The namespace of a NiceObject may hold only a weak proxy to it, so that caching the namespace
+    on the object doesn't create a reference cycle.
+    """
+    def __init__(self, target, lib, limiters):
+        self._target = target
+        self._lib = lib
+        self._limiters = limiters
+
+    @classmethod
+    def for_lib(cls, lib):
+        limit = lib._aio_limit_
+        return cls(lib, lib, [Limiter(limit)] if limit else [])
+
+    @classmethod
+    def for_object(cls, niceobj, weak=False):
+        lib = niceobj._parent_lib
+        limiters = list(lib.aio._limiters)
+        limit = niceobj._aio_limit_
+        if limit:
+            limiters.append(Limiter(limit))
+        return cls(proxy(niceobj) if weak else niceobj, lib, limiters)
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        func = getattr(self._target, name)
+        if not callable(func):
+            raise AttributeError("'{}' is not a function".format(name))
+
+        # Look up the function on each call rather than holding on to it, since a bound method
+        # would keep a NiceObject alive
+        async def aio_func(*args, **kwds):
+            return await self._run(partial(getattr(self._target, name), *args, **kwds))
+
+        aio_func.__name__ = name
+        aio_func.__qualname__ = 'aio.' + name
+        aio_func.__doc__ = func.__doc__
+        self.__dict__[name] = aio_func
+        return aio_func
+
+    def __dir__(self):
+        return [name for name in dir(self._target)
+                if not name.startswith('_') and callable(getattr(self._target, name, None))]
+
+    async def _run(self, call):
+        loop = asyncio.get_running_loop()
+        acquired = []
+        try:
+            for limiter in self._limiters:
+                semaphore = limiter.semaphore
+                await semaphore.acquire()
+                acquired.append(semaphore)
+            future = loop.run_in_executor(self._lib._aio_executor_, call)
+        except BaseException:
+            _release(acquired)
+            raise
+
+        # Cancelling the awaiting task can't stop a C call that's already running, so keep the
+        # limiters until the executor is done with it. Shielding the future keeps a cancellation
+        # from marking it done early.
+        future.add_done_callback(partial(_call_done, acquired))
+        return await asyncio.shield(future)
+
+
+def _release(semaphores):
+    for semaphore in reversed(semaphores):
+        semaphore.release()
+
+
+def _call_done(semaphores, future):
+    _release(semaphores)
+    # If the awaiting task was cancelled, nothing else will look at the exception
+    if not future.cancelled():
+        future.exception()
@@ -3,10 +3,13 @@
 from __future__ import print_function
 
 import os
+import sys
 import os.path
 import logging
+import threading
+from contextlib import contextmanager
 import cffi
-from .util import handle_header_path, handle_lib_name
+from .util import handle_header_path, handle_lib_name, to_tuple, suppress
 from .process import process_headers, process_source
 from .__about__ import __version__
 
@@ -22,7 +25,7 @@ class LogBuffer(object):
 def build_lib(header_info, lib_name, module_name, filedir, ignored_headers=(),
               ignore_system_headers=False, preamble=None, token_hooks=(), ast_hooks=(),
               hook_groups=(), debug_file=None, logbuf=None, load_dump_file=False,
-              save_dump_file=False, pack=None, override=False):
+              save_dump_file=False, pack=None, override=False, api_mode=None):
     """Build a low-level Python wrapper of a C lib
 
     Parameters
@@ -88,6 +91,14 @@ def build_lib(header_info, lib_name, module_name, filedir, ignored_headers=(),
     override: bool
         Forwarded to ``FFI.cdef``. If True, allows repeated declarations; the final declaration will
         override any others. Otherwise, repeated declarations are treated as an error.
+    api_mode: bool
+        If True, compile a cffi API-mode extension module (named like ``'_mylib_api'``) that
+        includes the headers and links against the library, and make the generated module a thin
+        wrapper around it. Calls then go directly to C rather than through libffi, which is
+        faster, but this needs a C compiler (and on Windows, the lib's import library). If
+        compilation fails, falls back to the usual ABI mode. Defaults to the mode given to
+        `load_lib()` if it's running this build in the current thread, or else
+        ``DEFAULT_API_MODE``.
 
     Notes
     -----
@@ -158,27 +169,122 @@ def build_lib(header_info, lib_name, module_name, filedir, ignored_headers=(),
 
     clean_header_str, macro_code, argnames = retval
 
-    logbuf.write("Compiling cffi module...\n")
-    ffi = cffi.FFI()
-    ffi.cdef(clean_header_str, pack=pack, override=override)
-    ffi.set_source('.' + module_name, None)
-    ffi.compile(tmpdir=filedir)
+    if api_mode is None:
+        api_mode = getattr(_api_mode_override, 'value', None)
+    if api_mode is None:
+        api_mode = DEFAULT_API_MODE
+    ext_name = module_name + '_api'
+
+    if api_mode:
+        logbuf.write("Compiling API-mode cffi module...\n")
+        ffi = cffi.FFI()
+        ffi.cdef(clean_header_str, pack=pack, override=override)
+        header_paths = to_tuple(header_paths) if header_info else ()
+        api_mode = compile_api_module(ffi, ext_name, filedir, lib_path, header_paths, preamble,
+                                      logbuf)
+
+    if not api_mode:
+        logbuf.write("Compiling cffi module...\n")
+        ffi = cffi.FFI()
+        ffi.cdef(clean_header_str, pack=pack, override=override)
+        ffi.set_source('.' + module_name, None)
+        ffi.compile(tmpdir=filedir)
 
     logbuf.write("Writing macros...\n")
+    symbols = symbol_kinds(ffi)
 
     module_path = os.path.join(filedir, module_name + '.py')
-    with open(module_path, 'a') as f:
-        f.write(MODULE_TEMPLATE.format(
+    # In ABI mode, cffi has already written the module, so we add to it
+    with open(module_path, 'w' if api_mode else 'a') as f:
+        f.write((API_MODULE_TEMPLATE if api_mode else MODULE_TEMPLATE).format(
             build_version=__version__,
             lib_dir=os.path.dirname(lib_path),
             lib_path=lib_path,
+            ext_name=ext_name,
             macro_code=macro_code,
-            argnames=argnames
+            argnames=argnames,
+            symbols=symbols
         ))
 
     logbuf.write("Done building {}\n".format(module_name))
 
 
+def compile_api_module(ffi, ext_name, filedir, lib_path, header_paths, preamble, logbuf):
+    """Try to compile an API-mode extension module for `ffi`, returning whether it succeeded"""
+    source = (preamble or '') + '\n'
+    source += ''.join('#include "{}"\n'.format(path) for path in header_paths)
+
+    lib_dir, lib_file = os.path.split(lib_path)
+    if os.path.isabs(lib_path) and sys.platform != 'win32':
+        # Link against the exact file, and find it there at runtime too
+        link_kwds = dict(extra_objects=[lib_path], runtime_library_dirs=[lib_dir])
+    else:
+        link_name = lib_file.split('.')[0]
+        if sys.platform != 'win32' and link_name.startswith('lib'):
+            link_name = link_name[3:]
+        link_kwds = dict(libraries=[link_name], library_dirs=[lib_dir] if lib_dir else [])
+
+    ffi.set_source('.' + ext_name, source, **link_kwds)
+    try:
+        ffi.compile(tmpdir=filedir)
+    except Exception as e:
+        logbuf.write("Could not compile API-mode module, falling back to ABI mode: "
+                     "{}\n".format(e))
+        return False
+    finally:
+        # Only the compiled extension is needed, not its intermediate files
+        for ext in ('.c', '.o'):
+            with suppress(OSError):
+                os.remove(os.path.join(filedir, ext_name + ext))
+    return True
+
+
+def symbol_kinds(ffi):
+    """Map each name declared in `ffi`'s cdefs to its kind, for `nicelib.nicelib.SymbolIndex`
+
+    The kinds are ``'function'``, ``'constant'``, and ``'variable'``. This uses the internals of
+    cffi's parser, so if they're unavailable, returns None and the index is built at load time.
+    """
+    # These private attributes were checked against cffi 2.1.1, and have been part of its parser
+    # throughout the 1.x series. test_symbol_index checks that the foo test lib gets an index, so
+    # a cffi change that breaks this doesn't go unnoticed.
+    try:
+        declarations = ffi._parser._declarations
+        int_constants = ffi._parser._int_constants
+    except AttributeError:
+        return None
+
+    kinds = {}
+    for key in declarations:
+        decl_type, _, name = key.partition(' ')
+        if decl_type == 'function':
+            kinds[name] = 'function'
+        elif decl_type == 'variable':
+            kinds[name] = 'variable'
+        elif decl_type in ('constant', 'macro'):
+            kinds[name] = 'constant'
+    kinds.update((name, 'constant') for name in int_constants)
+    return kinds
+
+
+#: Whether `build_lib()` builds API-mode modules when its ``api_mode`` arg isn't given
+DEFAULT_API_MODE = False
+
+# Set by load_lib() while it runs a build, for the build_lib() calls that build makes. It's
+# per-thread so that builds in other threads still get the default.
+_api_mode_override = threading.local()
+
+
+@contextmanager
+def api_mode_override(api_mode):
+    """Make `build_lib()` calls in this thread default to `api_mode` within the block"""
+    old_value = getattr(_api_mode_override, 'value', None)
+    _api_mode_override.value = api_mode
+    try:
+        yield
+    finally:
+        _api_mode_override.value = old_value
+
 MODULE_TEMPLATE = """
 import os
 import os.path
@@ -194,4 +300,31 @@ os.chdir(_old_curdir)
 {macro_code}
 
 argnames = {argnames!r}
+
+symbols = {symbols!r}
+"""
+
+
+API_MODULE_TEMPLATE = """# Wrapper of the cffi API-mode module {ext_name}, generated by NiceLib
+import os
+import os.path
+from importlib import import_module
+build_version = {build_version!r}
+api_mode = True
+
+# Change directory in case of dependent libs not on PATH
+_old_curdir = os.path.abspath(os.curdir)
+if {lib_dir!r}:
+    os.chdir({lib_dir!r})
+_pkg = __name__.rpartition('.')[0]
+_ext = import_module((_pkg + '.' if _pkg else '') + {ext_name!r})
+os.chdir(_old_curdir)
+ffi = _ext.ffi
+lib = _ext.lib
+
+{macro_code}
+
+argnames = {argnames!r}
+
+symbols = {symbols!r}
 """
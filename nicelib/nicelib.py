@@ -3,15 +3,19 @@
 from __future__ import division, absolute_import, with_statement, print_function, unicode_literals
 
 from builtins import str, zip
-from past.builtins import basestring
+from past.builtins import basestring, long
 from future.utils import PY2, with_metaclass
 
 import re
 import sys
 import warnings
 import logging
+import threading
+from bisect import bisect_left
+from types import BuiltinFunctionType
 from inspect import isfunction
-from collections import deque
+from timeit import default_timer
+from collections import namedtuple, OrderedDict
 
 from .util import to_tuple, ChainMap, suppress
 
@@ -23,7 +27,8 @@ else:
 log = logging.getLogger(__name__)
 
 __all__ = ['NiceLib', 'NiceObject', 'Sig']
-FLAGS = {'prefix', 'ret', 'struct_maker', 'buflen', 'use_numpy', 'free_buf', 'use_handle'}
+FLAGS = {'prefix', 'ret', 'struct_maker', 'buflen', 'use_numpy', 'free_buf', 'use_handle',
+         'buf_pool'}
 UNDER_FLAGS = {'_{}_'.format(f) for f in FLAGS}
 USINGLE_FLAGS = {'_'+f for f in FLAGS}
 COMBINED_FLAGS = UNDER_FLAGS | USINGLE_FLAGS
@@ -34,6 +39,115 @@ USINGLE_NL_ATTRS = {'_'+a for a in NL_ATTRS}
 COMBINED_NL_ATTRS = UNDER_NL_ATTRS | USINGLE_NL_ATTRS
 
 ARG_HANDLERS = []
+_MISSING = object()
+
+#: Info about a single call of a `LibFunction`, as passed to call tracers
+CallTrace = namedtuple('CallTrace', ['name', 'args', 'c_args', 'retval', 'duration'])
+
+
+class CallStats(object):
+    """Metrics accumulated over the calls of a single `LibFunction`
+
+    Only the C call itself is timed. Call times are also counted in a histogram with bins at each
+    decade from 1 us to 10 s (see `BIN_EDGES`).
+    """
+    BIN_EDGES = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1., 10.)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.errors = 0
+            self.total_time = 0.
+            self.max_time = 0.
+            self.out_bytes = 0
+            self.hist = [0] * (len(self.BIN_EDGES) + 1)
+
+    def add_call(self, duration, out_bytes):
+        with self._lock:
+            self.calls += 1
+            self.total_time += duration
+            if duration > self.max_time:
+                self.max_time = duration
+            self.out_bytes += out_bytes
+            self.hist[bisect_left(self.BIN_EDGES, duration)] += 1
+
+    def add_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self, reset=False):
+        """Get the stats as a dict, optionally resetting them at the same time
+
+        The ``'hist'`` entry is a list of ``(upper_edge, count)`` pairs, the last of which has an
+        upper edge of ``inf``.
+        """
+        with self._lock:
+            snap = {
+                'calls': self.calls,
+                'errors': self.errors,
+                'total_time': self.total_time,
+                'mean_time': self.total_time / self.calls if self.calls else 0.,
+                'max_time': self.max_time,
+                'out_bytes': self.out_bytes,
+                'hist': list(zip(self.BIN_EDGES + (float('inf'),), self.hist)),
+            }
+        if reset:
+            self.reset()
+        return snap
+
+
+class CallProfile(object):
+    """Time spent in each phase of the calls of a single `LibFunction`
+
+    The phases are, in order: ``'bind'`` (binding the args), ``'arg <name>'`` for each argument's
+    conversion to a C arg, ``'C call'``, ``'outputs'`` (extracting the output args), and ``'ret'``
+    (the return handler). Profiling adds overhead of its own, so only the relative sizes of
+    the Python phases are meaningful.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.phases = OrderedDict()
+
+    def add(self, phase, duration):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.) + duration
+
+    def add_call(self):
+        with self._lock:
+            self.calls += 1
+
+    def snapshot(self, reset=False):
+        """Get the number of calls and an OrderedDict of the total time spent in each phase"""
+        with self._lock:
+            snap = {'calls': self.calls, 'phases': OrderedDict(self.phases)}
+        if reset:
+            self.reset()
+        return snap
+
+
+def format_profile(profiles):
+    """Format the output of `LibMeta._profile()` as a table of the per-call time of each phase"""
+    lines = ['{:<24} {:<20} {:>10} {:>6}'.format('function', 'phase', 'us/call', '%')]
+    for name, snap in sorted(profiles.items()):
+        calls = snap['calls']
+        if not calls:
+            continue
+        total = sum(snap['phases'].values())
+        for i, (phase, duration) in enumerate(snap['phases'].items()):
+            label = '{} ({})'.format(name, calls) if i == 0 else ''
+            lines.append('{:<24} {:<20} {:>10.2f} {:>6.1f}'.format(
+                label, phase, duration / calls * 1e6, 100 * duration / total if total else 0.))
+        lines.append('{:<24} {:<20} {:>10.2f}'.format('', 'total', total / calls * 1e6))
+    return '\n'.join(lines)
 
 
 def register_arg_handler(arg_handler):
@@ -41,20 +155,82 @@ def register_arg_handler(arg_handler):
     return arg_handler
 
 
-def c_to_numpy_array(ffi, c_arr, size):
+_dtypes = {}  # Cache of ctype: dtype, shared by all conversions to and from numpy
+CHAR_TYPES = {'wchar_t', 'char16_t', 'char32_t'}
+
+
+def numpy_dtype(ffi, ctype):
+    """Get the numpy dtype that corresponds to the cffi type `ctype`
+
+    Primitives (including ``_Bool``, the stdint typedefs, ``size_t`` etc.), pointers, enums,
+    fixed-length arrays, and structs/unions are supported. Struct dtypes are structured dtypes that
+    match the C layout (field offsets and padding included), so they can be used to view C memory
+    without copying. Each dtype is computed only once per ctype.
+    """
+    try:
+        return _dtypes[ctype]
+    except KeyError:
+        dtype = _dtypes[ctype] = _make_numpy_dtype(ffi, ctype)
+        return dtype
+
+
+def _make_numpy_dtype(ffi, ctype):
     import numpy as np
-    arrtype = ffi.typeof(c_arr)
-    cname = arrtype.item.cname
-    if cname.startswith(('int', 'long', 'short', 'char', 'signed')):
-        prefix = 'i'
-    elif cname.startswith('unsigned'):
-        prefix = 'u'
-    elif cname.startswith(('float', 'double')):
-        prefix = 'f'
+    kind = ctype.kind
+    if kind in ('struct', 'union'):
+        return _struct_dtype(ffi, ctype)
+    elif kind == 'array':
+        if ctype.length is None:
+            raise TypeError("Can't make dtype for variable-length array {}".format(ctype.cname))
+        return np.dtype((numpy_dtype(ffi, ctype.item), ctype.length))
+    elif kind == 'pointer':
+        return np.dtype('u' + str(ffi.sizeof(ctype)))
+    elif kind not in ('primitive', 'enum'):
+        raise TypeError("Unknown type {}".format(ctype.cname))
+
+    cname = ctype.cname
+    size = ffi.sizeof(ctype)
+    if cname == '_Bool':
+        return np.dtype('?')
+    elif cname == 'char':
+        return np.dtype('i1')
+    elif cname in CHAR_TYPES:
+        return np.dtype('u' + str(size))
+    elif cname in ('float', 'double', 'long double'):
+        dtype = np.dtype(np.longdouble) if cname == 'long double' else np.dtype('f' + str(size))
+    elif 'complex' in cname.lower():
+        dtype = np.dtype('c' + str(size))
     else:
-        raise TypeError("Unknown type {}".format(cname))
+        # All remaining primitives are integers. Let cffi tell us their signedness, since names
+        # like 'size_t' and 'ptrdiff_t' don't
+        signed = int(ffi.cast(ctype, -1)) < 0
+        return np.dtype(('i' if signed else 'u') + str(size))
+
+    if dtype.itemsize != size:
+        raise TypeError("No numpy type matches {} ({} bytes)".format(cname, size))
+    return dtype
 
-    dtype = np.dtype(prefix + str(ffi.sizeof(arrtype.item)))
+
+def _struct_dtype(ffi, ctype):
+    import numpy as np
+    if ctype.fields is None:
+        raise TypeError("Can't make dtype for opaque type {}".format(ctype.cname))
+
+    names, formats, offsets = [], [], []
+    for name, field in ctype.fields:
+        if field.bitsize != -1:
+            raise TypeError("Bitfield '{}' of {} has no numpy equivalent".format(name, ctype.cname))
+        names.append(name)
+        formats.append(numpy_dtype(ffi, field.type))
+        offsets.append(field.offset)
+
+    return np.dtype({'names': names, 'formats': formats, 'offsets': offsets,
+                     'itemsize': ffi.sizeof(ctype)})
+
+
+def c_to_numpy_array(ffi, c_arr, size):
+    import numpy as np
+    dtype = numpy_dtype(ffi, ffi.typeof(c_arr).item)
     return np.frombuffer(ffi.buffer(c_arr), dtype=dtype)
 
 
@@ -152,6 +328,7 @@ class Sig(object):
         self.in_handlers = [h for h in self.handlers if h.takes_input]
         self.out_handlers = [h for h in self.handlers if h.makes_output]
         self.num_inargs = len(self.in_handlers)
+        self.defers_c_args = any(h.defers_c_arg for h in self.handlers)
 
     def _make_arg_handler(self, arg_str):
         for handler_class in ARG_HANDLERS:
@@ -161,6 +338,8 @@ class Sig(object):
         raise ValueError("Unrecognized argtype string '{}'".format(arg_str))
 
     def bind_argtypes(self, ffi, func_name, c_argtypes, ret_handler, c_argnames):
+        # Snapshot the resolved flags; a plain dict is much cheaper to query per call than ChainMap
+        self.flags = dict(self.flags)
         self.ffi = ffi
         self.func_name = func_name
         self.c_argtypes = c_argtypes
@@ -188,36 +367,72 @@ class Sig(object):
             if handler.makes_output:
                 self.retnames.append(c_argname)
 
+        for handler, c_argtype in zip(self.handlers, c_argtypes):
+            if isinstance(c_argtype, ffi.CType):
+                handler.bind(ffi)
+
     def _next_default_argname(self):
         self._num_default_args += 1
         return 'arg{}'.format(self._num_default_args)
 
-    def make_c_args(self, args):
-        py_args = deque(args)
+    def make_c_args(self, args, state, profile=None):
+        """Make the C args for a call
+
+        `state` is a dict private to this call, which handlers use to share info (like array
+        lengths) with each other and with `extract_out_vals()`. Handlers themselves are shared by
+        every call, including concurrent calls from other threads, so they must not store any
+        per-call info on themselves.
+
+        If a `CallProfile` is given, the time taken by each handler is added to it.
+        """
+        py_args = iter(args)
         c_args = []
         for handler in self.handlers:
-            log.debug("Making C arg for %s", handler)
-            py_arg = py_args.popleft() if handler.takes_input else None
+            if profile is not None:
+                start = default_timer()
+            py_arg = next(py_args) if handler.takes_input else None
             try:
-                c_args.append(handler.make_c_arg(self.ffi, py_arg))
+                c_args.append(handler.make_c_arg(self.ffi, py_arg, state))
             except TypeError as e:
-                msg = ("Invalid input for argument '{}' of {}. Could not make valid cffi arg from "
-                       "{!r}".format(handler.c_argname, self.func_name, py_arg))
-                old_msg = str(e)
-                msg = msg + '\n\n' + old_msg if old_msg else msg
-                raise TypeError(msg)
+                raise self.c_arg_error(handler, py_arg, e)
+            if profile is not None:
+                profile.add('arg ' + handler.c_argname, default_timer() - start)
 
-        # Do second pass to clean up callables; beware that cdata can be callable though
-        return [a() if (not isinstance(a, self.ffi.CData) and callable(a)) else a for a in c_args]
-
-    def extract_outputs(self, c_args, retval, ret_handler_kwargs):
-        out_vals = [handler.extract_output(self.ffi, c_arg)
-                    for handler, c_arg in zip(self.handlers, c_args)
-                    if handler.makes_output]
+        if not self.defers_c_args:
+            return c_args
 
-        if self.ret_handler:
-            retval = self.ret_handler.handle(retval, ret_handler_kwargs)
+        # Do second pass to clean up callables; beware that cdata can be callable though
+        if profile is None:
+            return [a() if (not isinstance(a, self.ffi.CData) and callable(a)) else a
+                    for a in c_args]
+
+        for i, (handler, a) in enumerate(zip(self.handlers, c_args)):
+            if not isinstance(a, self.ffi.CData) and callable(a):
+                start = default_timer()
+                c_args[i] = a()
+                profile.add('arg ' + handler.c_argname, default_timer() - start)
+        return c_args
+
+    def c_arg_error(self, handler, py_arg, exc):
+        msg = ("Invalid input for argument '{}' of {}. Could not make valid cffi arg from "
+               "{!r}".format(handler.c_argname, self.func_name, py_arg))
+        old_msg = str(exc)
+        msg = msg + '\n\n' + old_msg if old_msg else msg
+        return TypeError(msg)
+
+    def extract_out_vals(self, c_args, state):
+        """Get the values of the output args, freeing any C-allocated buffers along the way
+
+        This must happen before the ret handler runs, since a raising ret handler would otherwise
+        leak those buffers.
+        """
+        return [handler.extract_output(self.ffi, c_arg, state)
+                for handler, c_arg in zip(self.handlers, c_args)
+                if handler.makes_output]
 
+    @staticmethod
+    def combine_outputs(out_vals, retval):
+        """Combine the output values with the (already handled) `retval` into the return value(s)"""
         if retval is not None:
             out_vals.append(retval)
 
@@ -231,6 +446,7 @@ class Sig(object):
 
 class ArgHandler(object):
     handlers = []
+    defers_c_arg = True  # make_c_arg() may return a callable that must be resolved in a 2nd pass
 
     @classmethod
     def start_sig_definition(cls):
@@ -262,17 +478,66 @@ class ArgHandler(object):
     def arg_py_str(self):
         return self.c_argname or 'arg'
 
-    def make_c_arg(self, ffi, arg_value):
+    def bind(self, ffi):
+        """Precompute anything that depends only on the (now known) C argtype and flags"""
+        pass
+
+    def make_c_arg(self, ffi, arg_value, state):
         raise NotImplementedError
 
-    def extract_output(self, ffi, c_arg):
+    def extract_output(self, ffi, c_arg, state):
         raise NotImplementedError
 
 
+class BufferPool(object):
+    """Per-thread cache of cffi buffers that are reused across calls
+
+    Buffers are keyed by ctype and length. Each thread gets its own set of buffers, of which only
+    the `max_buffers` most recently used are kept. Reused buffers still hold the contents written by
+    the previous call, unless `clear` is given to `get()`.
+    """
+    def __init__(self, ffi, max_buffers=4):
+        self.ffi = ffi
+        self.max_buffers = max_buffers
+        self._local = threading.local()
+
+    def get(self, ctype, length=None, clear=False):
+        try:
+            buffers = self._local.buffers
+        except AttributeError:
+            buffers = self._local.buffers = OrderedDict()
+
+        key = (ctype, length)
+        buf = buffers.pop(key, None)
+        if buf is None:
+            buf = self.ffi.new(ctype) if length is None else self.ffi.new(ctype, length)
+            if len(buffers) >= self.max_buffers:
+                buffers.popitem(last=False)
+        elif clear:
+            buffer = self.ffi.buffer(buf)
+            buffer[:] = b'\0' * len(buffer)
+
+        buffers[key] = buf
+        return buf
+
+
+def _make_buffer_pool(ffi, flags):
+    """Return ``(pool, copy_out)`` for the given ``buf_pool`` flag value"""
+    mode = flags.get('buf_pool')
+    if not mode:
+        return None, False
+    elif mode is True or mode == 'alias':
+        return BufferPool(ffi), False
+    elif mode == 'copy':
+        return BufferPool(ffi), True
+    raise ValueError("buf_pool must be False, True, 'alias', or 'copy', got {!r}".format(mode))
+
+
 @register_arg_handler
 class InArgHandler(ArgHandler):
     takes_input = True
     makes_output = False
+    defers_c_arg = False
 
     @classmethod
     def create(cls, sig, arg_str):
@@ -280,14 +545,22 @@ class InArgHandler(ArgHandler):
             return None
         return cls(sig, arg_str)
 
-    def make_c_arg(self, ffi, arg_value):
-        return _wrap_inarg(ffi, self.c_argtype, arg_value)
+    def __init__(self, sig, arg_str):
+        ArgHandler.__init__(self, sig, arg_str)
+        self.convert = _passthrough  # For variadic args, which have no argtype
+
+    def bind(self, ffi):
+        self.convert = _make_inarg_converter(ffi, self.c_argtype)
+
+    def make_c_arg(self, ffi, arg_value, state):
+        return self.convert(arg_value)
 
 
 @register_arg_handler
 class OutArgHandler(ArgHandler):
     takes_input = False
     makes_output = True
+    defers_c_arg = False
 
     @classmethod
     def create(cls, sig, arg_str):
@@ -295,14 +568,35 @@ class OutArgHandler(ArgHandler):
             return None
         return cls(sig, arg_str)
 
-    def make_c_arg(self, ffi, arg_value):
-        if self.c_argtype.kind == 'pointer' and self.c_argtype.item.kind == 'struct':
+    def bind(self, ffi):
+        self.is_struct = self.c_argtype.kind == 'pointer' and self.c_argtype.item.kind == 'struct'
+        self.use_numpy = self.is_struct and self.sig.flags['use_numpy']
+        if self.use_numpy:
+            # Structs without a numpy equivalent (e.g. with bitfields) are returned as cdata.
+            # Checking here means a call never fails after its C function has already run.
+            try:
+                numpy_dtype(ffi, self.c_argtype.item)
+            except TypeError:
+                self.use_numpy = False
+        # Struct and array outputs are returned by reference (and structs may need
+        # struct_maker), so aren't pooled
+        by_reference = self.is_struct or (self.c_argtype.kind == 'pointer' and
+                                          self.c_argtype.item.kind == 'array')
+        self.pool = None if by_reference else _make_buffer_pool(ffi, self.sig.flags)[0]
+
+    def make_c_arg(self, ffi, arg_value, state):
+        if self.is_struct:
             arg = self.sig.flags['struct_maker'](self.c_argtype)
+        elif self.pool:
+            arg = self.pool.get(self.c_argtype, clear=True)
         else:
             arg = ffi.new(self.c_argtype)
         return arg
 
-    def extract_output(self, ffi, c_arg):
+    def extract_output(self, ffi, c_arg, state):
+        if self.use_numpy:
+            # Structured scalar that views the struct's memory
+            return c_to_numpy_array(ffi, c_arg, 1)[0]
         return c_arg[0]
 
 
@@ -310,13 +604,14 @@ class OutArgHandler(ArgHandler):
 class InOutArgHandler(ArgHandler):
     takes_input = True
     makes_output = True
+    defers_c_arg = False
 
     @classmethod
     def create(cls, sig, arg_str):
         if arg_str == 'inout':
             return cls(sig, arg_str)
 
-    def make_c_arg(self, ffi, arg_value):
+    def make_c_arg(self, ffi, arg_value, state):
         inarg_type = (ffi.typeof(arg_value) if isinstance(arg_value, ffi.CData) else
                       type(arg_value))
 
@@ -337,7 +632,7 @@ class InOutArgHandler(ArgHandler):
             raise TypeError("Cannot convert {} to required type {}"
                             "".format(arg_value, self.c_argtype))
 
-    def extract_output(self, ffi, c_arg):
+    def extract_output(self, ffi, c_arg, state):
         if self.c_argtype.cname == 'void *':
             return c_arg  # Don't dereference void pointers directly
         else:
@@ -348,6 +643,7 @@ class InOutArgHandler(ArgHandler):
 class IgnoreArgHandler(ArgHandler):
     takes_input = False
     makes_output = False
+    defers_c_arg = False
 
     @classmethod
     def create(cls, sig, arg_str):
@@ -356,8 +652,13 @@ class IgnoreArgHandler(ArgHandler):
         else:
             return None
 
-    def make_c_arg(self, ffi, arg_value):
-        return ffi.new(self.c_argtype.cname + '*')[0]
+    def bind(self, ffi):
+        # The zero/NULL value never changes, so make it just once
+        self._zero_owner = ffi.new(self.c_argtype.cname + '*')
+        self.zero_value = self._zero_owner[0]
+
+    def make_c_arg(self, ffi, arg_value, state):
+        return self.zero_value
 
 
 @register_arg_handler
@@ -370,6 +671,11 @@ class ArrayLenArgHandler(ArgHandler):
 
     makes_output = False
 
+    @property
+    def defers_c_arg(self):
+        # A caller-supplied array determines the length, and may come later in the arglist
+        return self.arr_handler.takes_input
+
     @classmethod
     def create(cls, sig, arg_str):
         m = cls.RE_LEN.match(arg_str)
@@ -391,30 +697,38 @@ class ArrayLenArgHandler(ArgHandler):
         else:
             return None
 
-    def make_c_arg(self, ffi, arg_value):
-        # Save len for later use by ArrayArgHandler
+    def make_c_arg(self, ffi, arg_value, state):
         if self.get_len:
-            self.len = arg_value
+            length = arg_value
         elif self.fixed_len:
-            self.len = self.fixed_len
+            length = self.fixed_len
+        elif self.arr_handler.takes_input:
+            length = None  # Use the whole array
         else:
-            self.len = self.sig.flags['buflen']
+            length = self.sig.flags['buflen']
+
+        if self.arr_handler.takes_input:
+            return lambda: self._c_len(ffi, self.arr_handler.check_len(length, state))
+
+        # Save len for later use by ArrayArgHandler
+        state[self] = length
+        return self._c_len(ffi, length)
 
-        # self.len is number of array elements
+    def _c_len(self, ffi, length):
+        # length is number of array elements
         # We return # of elements scaled by the given measurement size
         if self.size_type:
             meas_size = (1 if self.size_type == 'byte' else ffi.sizeof(self.size_type))
             item_size = ffi.sizeof(self.arr_handler.c_argtype)
-            return self.len * item_size // meas_size
+            return length * item_size // meas_size
         else:
-            return self.len
+            return length
 
 
 @register_arg_handler
 class ArrayArgHandler(ArgHandler):
-    RE_ARR = re.compile(r'(arr|buf)(\[([0-9]+)\])?$')
+    RE_ARR = re.compile(r'(arr|buf)(\[([0-9]+)\])?(=in)?$')
 
-    takes_input = False
     makes_output = True
 
     @classmethod
@@ -454,56 +768,119 @@ class ArrayArgHandler(ArgHandler):
         if m:
             is_buf = (m.group(1) == 'buf')
             len_num = None if m.group(3) is None else int(m.group(3))
-            handler = cls(sig, arg_str, is_buf, len_num)
+            takes_input = (m.group(4) is not None)
+            if is_buf and takes_input:
+                raise ValueError("'buf' does not accept a caller-supplied array, use 'arr=in'")
+            handler = cls(sig, arg_str, is_buf, len_num, takes_input)
             if len_num is None:
                 cls._add_new_arr_handler(handler)
             return handler
         return None
 
-    def __init__(self, sig, arg_str, is_buf, given_len):
+    def __init__(self, sig, arg_str, is_buf, given_len, takes_input=False):
         ArgHandler.__init__(self, sig, arg_str)
         self.is_buf = is_buf
         self.given_len = given_len
         self.len_handler = None
-
-    def extract_output(self, ffi, c_arg):
-        if self.is_buf:
+        self.takes_input = takes_input
+        self.defers_c_arg = not takes_input
+
+    def bind(self, ffi):
+        self.arr_ctype = 'char[]' if self.is_buf else '{}[]'.format(self.c_argtype.item.cname)
+        self.use_numpy = self.sig.flags['use_numpy']
+        self.pool, self.copy_out = _make_buffer_pool(ffi, self.sig.flags)
+
+    def extract_output(self, ffi, c_arg, state):
+        if self.takes_input:
+            return state[self][0]  # The caller's own array, now filled
+        elif self.is_buf:
             return ffi.string(c_arg)
-        elif self.sig.flags['use_numpy']:
-            return c_to_numpy_array(ffi, c_arg, self.len())
+        elif self.use_numpy:
+            arr = c_to_numpy_array(ffi, c_arg, self.len(state))
+            return arr.copy() if self.copy_out else arr
+        elif self.copy_out:
+            arr = ffi.new(self.arr_ctype, len(c_arg))
+            ffi.memmove(arr, c_arg, ffi.sizeof(c_arg))
+            return arr
         else:
             return c_arg
 
-    def len(self):
+    def len(self, state):
         if self.given_len:
             return self.given_len
         else:
-            return self.len_handler.len
+            return state[self.len_handler]
+
+    def check_len(self, length, state):
+        """Check a requested length against the caller-supplied array"""
+        available = state[self][1]
+        if length is None:
+            return available
+        elif length > available:
+            raise ValueError("Requested length {} of '{}' exceeds the {} elements of the given "
+                             "array".format(length, self.c_argname, available))
+        return length
+
+    def _from_buffer(self, ffi, arr):
+        np = sys.modules.get('numpy')
+        if np is not None and isinstance(arr, np.ndarray):
+            dtype = numpy_dtype(ffi, self.c_argtype.item)
+            if arr.dtype != dtype:
+                raise TypeError("Array has dtype {}, expected {}".format(arr.dtype, dtype))
+            if not arr.flags.c_contiguous:
+                raise TypeError("Array must be C-contiguous")
+            if not arr.flags.writeable:
+                raise TypeError("Array must be writable")
 
-    def make_c_arg(self, ffi, arg_value):
-        if self.is_buf:
-            return lambda: ffi.new('char[]', self.len())
+        try:
+            c_arg = ffi.from_buffer(self.arr_ctype, arr, require_writable=True)
+        except BufferError as e:
+            raise TypeError(str(e))
+        nbytes = len(ffi.buffer(ffi.from_buffer(arr)))
+        if nbytes != ffi.sizeof(c_arg):
+            raise TypeError("Buffer size of {} bytes is not a multiple of the item size "
+                            "{}".format(nbytes, ffi.sizeof(self.c_argtype.item)))
+        return c_arg
+
+    def make_c_arg(self, ffi, arg_value, state):
+        if self.takes_input:
+            c_arg = self._from_buffer(ffi, arg_value)
+            state[self] = (arg_value, len(c_arg))
+            if self.given_len:
+                self.check_len(self.given_len, state)
+            return c_arg
+        elif self.pool:
+            # A 'buf' must not show a previous call's string if the function doesn't write to it
+            return lambda: self.pool.get(self.arr_ctype, self.len(state), clear=self.is_buf)
         else:
-            return lambda: ffi.new('{}[]'.format(self.c_argtype.item.cname), self.len())
+            return lambda: ffi.new(self.arr_ctype, self.len(state))
 
 
 @register_arg_handler
 class BufOutArgHandler(ArgHandler):
     takes_input = False
     makes_output = True
+    defers_c_arg = False
 
     @classmethod
     def create(cls, sig, arg_str):
         if arg_str == 'bufout':
             return cls(sig, arg_str)
 
-    def make_c_arg(self, ffi, arg_value):
-        if not (self.c_argtype.kind == 'pointer' and self.c_argtype.item.kind == 'pointer' and
-                self.c_argtype.item.item.kind == 'primitive'):
+    def bind(self, ffi):
+        self.is_valid = (self.c_argtype.kind == 'pointer' and
+                         self.c_argtype.item.kind == 'pointer' and
+                         self.c_argtype.item.item.kind == 'primitive')
+        self.pool = _make_buffer_pool(ffi, self.sig.flags)[0]
+
+    def make_c_arg(self, ffi, arg_value, state):
+        if not self.is_valid:
             raise TypeError("'bufout' applies only to type 'char**'")
+        elif self.pool:
+            return self.pool.get(self.c_argtype, clear=True)  # Must start out NULL
         return ffi.new(self.c_argtype)
 
-    def extract_output(self, ffi, c_arg):
+    def extract_output(self, ffi, c_arg, state):
         if c_arg[0] == ffi.NULL:
             return None
         string = ffi.string(c_arg[0])
@@ -516,9 +893,13 @@ class BufOutArgHandler(ArgHandler):
 
 class RetHandler(object):
     """Decorator class for creating return handlers"""
+    #: Names of the kwargs that handlers may request, in the order `compile()` passes them
+    INJECTED_ARGS = ('niceobj', 'funcname', 'funcargs')
+
     def __init__(self, func=None, name=None, num_retvals=None):
         self.__name__ = name
         self.num_retvals = num_retvals
+        self.discards_retval = False  # Handler does nothing, so calling it can be skipped
         if func:
             self(func)
 
@@ -528,7 +909,8 @@ class RetHandler(object):
         if hasattr(func, '__name__') and not self.__name__:
             self.__name__ = func.__name__
 
-        self.kwargs = set(getargspec(func).args[1:])
+        self.argnames = tuple(getargspec(func).args[1:])
+        self.kwargs = set(self.argnames)
         return self
 
     def __repr__(self):
@@ -542,6 +924,45 @@ class RetHandler(object):
                            "'{}'".format(e.args[0], self.__name__))
         return self.__func__(retval, **kwargs)
 
+    def compile(self, funcname):
+        """Work out how to call this handler for the function `funcname`, ahead of any calls
+
+        Returns a pair (`func`, `takes_context`). If `takes_context` is False, the handler is
+        invoked as ``func(retval)``, otherwise as ``func(retval, niceobj, funcargs)``. `func` is
+        None if the handler discards the return value without doing anything else.
+        """
+        if self.discards_retval:
+            return None, False
+
+        func = self.__func__
+        argnames = self.argnames
+        if not argnames:
+            return func, False
+
+        unknown = [arg for arg in argnames if arg not in self.INJECTED_ARGS]
+        if unknown:
+            def invoke(retval, niceobj, funcargs):
+                raise KeyError("Unknown arg '{}' in arglist of ret-handling function "
+                               "'{}'".format(unknown[0], self.__name__))
+
+        elif argnames == self.INJECTED_ARGS[:len(argnames)]:
+            # Common orderings can be passed along positionally without any shuffling
+            if len(argnames) == 1:
+                invoke = lambda retval, niceobj, funcargs: func(retval, niceobj)
+            elif len(argnames) == 2:
+                invoke = lambda retval, niceobj, funcargs: func(retval, niceobj, funcname)
+            else:
+                invoke = lambda retval, niceobj, funcargs: func(retval, niceobj, funcname,
+                                                                funcargs)
+        else:
+            positions = [self.INJECTED_ARGS.index(arg) for arg in argnames]
+
+            def invoke(retval, niceobj, funcargs):
+                available = (niceobj, funcname, funcargs)
+                return func(retval, *[available[i] for i in positions])
+
+        return invoke, True
+
 
 @RetHandler(num_retvals=1)
 def ret_return(retval):
@@ -553,6 +974,7 @@ def ret_return(retval):
 def ret_ignore(retval):
     """Ignore the return value."""
     pass
+ret_ignore.discards_retval = True
 
 
 class NiceObjectMeta(type):
@@ -577,6 +999,10 @@ class NiceObjectMeta(type):
                               Sig.from_tuple(value.sig))
             elif name == '_n_handles_':
                 classdict['_n_handles'] = value
+            elif name == '_slots_':
+                if value:
+                    extra = () if value is True else tuple(value)
+                    classdict['__slots__'] = ('_handles',) + extra
             elif name in COMBINED_FLAGS:
                 flags[name.strip('_')] = value
             else:
@@ -602,20 +1028,39 @@ class NiceObjectMeta(type):
                 init = getattr(parent_lib, init)
             cls._init_func = staticmethod(init)
 
+        cls._parent_lib = parent_lib
+        cls._libfuncs = {}
+        cls._unbound_sigs = {}
         for name, sig in cls._sigs.items():
             sig.set_default_flags((cls._flags, parent_lib._base_flags))
-            libfunc = parent_lib._create_libfunction(name, sig)
-
-            if not libfunc:
-                log.warning("Function '%s' could not be found using prefixes %r",
-                            name, sig.flags['prefix'])
+            if parent_lib._lazy_:
+                cls._unbound_sigs[name] = sig
+                if name in cls._hybrid_funcs:
+                    setattr(cls, '_autofunc_'+name, _LazyLibFunction(cls, name))
+                    setattr(cls, name, cls._hybrid_funcs[name])
+                else:
+                    setattr(cls, name, _LazyLibFunction(cls, name))
             else:
-                try:
-                    hybrid_func = cls._hybrid_funcs[name]
-                    setattr(cls, '_autofunc_'+name, libfunc)
-                    setattr(cls, name, hybrid_func)  # Set hybrid func as instancemethod
-                except KeyError:
-                    setattr(cls, name, libfunc)  # Set func as instancemethod
+                cls._install_libfunction(name, parent_lib._create_libfunction(name, sig))
+
+    def _install_libfunction(cls, name, libfunc):
+        if not libfunc:
+            log.warning("Function '%s' could not be found using prefixes %r",
+                        name, cls._sigs[name].flags['prefix'])
+            with suppress(AttributeError):
+                delattr(cls, '_autofunc_'+name if name in cls._hybrid_funcs else name)
+            return
+
+        cls._libfuncs[name] = libfunc
+        try:
+            hybrid_func = cls._hybrid_funcs[name]
+            setattr(cls, '_autofunc_'+name, libfunc)
+            setattr(cls, name, hybrid_func)  # Set hybrid func as instancemethod
+        except KeyError:
+            setattr(cls, name, libfunc)  # Set func as instancemethod
+
+    def _bind_libfunction(cls, name):
+        return _bind_libfunction(cls, cls._parent_lib, name)
 
     @classmethod
     def from_niceobjectdef(metacls, cls_name, niceobjdef, parent_lib):
@@ -632,6 +1077,65 @@ class NiceObjectMeta(type):
         return cls
 
 
+_bind_lock = threading.RLock()
+
+
+def _bind_libfunction(cls, lib, shortname):
+    """Create and install the LibFunction for one of the unbound sigs of a NiceLib or NiceObject
+
+    Returns the LibFunction, or None if the C function couldn't be found.
+    """
+    with _bind_lock:
+        sig = cls._unbound_sigs.pop(shortname, None)
+        if sig is None:
+            return cls._libfuncs.get(shortname)  # Already bound (possibly by another thread)
+        log.info('Creating libfunc for %s', sig)
+        libfunc = lib._create_libfunction(shortname, sig)
+        cls._install_libfunction(shortname, libfunc)
+        return libfunc
+
+
+class _LazyLibFunction(object):
+    """Placeholder that creates a LibFunction the first time it's accessed (see ``_lazy_``)
+
+    Once created, the LibFunction replaces this placeholder in the class, so later lookups go
+    straight to it.
+    """
+    def __init__(self, cls, shortname):
+        self._cls = cls
+        self._shortname = shortname
+
+    def __get__(self, instance, owner):
+        libfunc = self._cls._bind_libfunction(self._shortname)
+        if libfunc is None:
+            raise AttributeError("No lib function found for '{}'".format(self._shortname))
+        return libfunc.__get__(instance, owner)
+
+
+class _AioAccessor(object):
+    """Gives the ``aio`` namespace of a NiceLib class or NiceObject instance
+
+    This is a non-data descriptor, so a library function named ``aio`` takes precedence.
+    """
+    def __get__(self, instance, owner):
+        if PY2:
+            raise AttributeError("'aio' requires Python 3.7+")
+        from .aio import AioNamespace
+
+        if instance is not None:
+            # The cached namespace refers back to its object only weakly, to avoid a reference
+            # cycle. Slotted objects can't be weakly referenced, so they get a new one each time.
+            if not hasattr(instance, '__dict__'):
+                return AioNamespace.for_object(instance)
+            namespace = instance.__dict__['aio'] = AioNamespace.for_object(instance, weak=True)
+            return namespace
+        elif issubclass(owner, NiceObject):
+            return self
+        elif '_aio_namespace' not in owner.__dict__:
+            owner._aio_namespace = AioNamespace.for_lib(owner)
+        return owner._aio_namespace
+
+
 class NiceObject(with_metaclass(NiceObjectMeta, object)):
     """Base class for object-like mid-level library wrappers
 
@@ -658,11 +1162,28 @@ class NiceObject(with_metaclass(NiceObjectMeta, object)):
         The default length for buffers. This can be overridden on a per-argument basis in the
         argument's spec string, e.g ``'len=64'`` will make a 64-byte buffer.
     _use_numpy_ : bool, optional
-        If true, convert output args marked as 'arr' to ``numpy`` arrays. Obviously requires
-        ``numpy`` to be installed.
+        If true, convert output args marked as 'arr' to ``numpy`` arrays, and struct 'out' args to
+        structured scalars. Obviously requires ``numpy`` to be installed.
+    _buf_pool_ : bool or str, optional
+        If true, reuse the buffers allocated for 'out', 'arr', 'buf', and 'bufout' args across
+        calls instead of allocating new ones each time. Only 'arr' buffers keep the previous call's
+        contents. With True (or ``'alias'``), arrays returned for 'arr' args share memory with the
+        pooled buffer, so they are only valid until the next call of the same function in the same
+        thread. With ``'copy'``, they are copied out first. Struct and array 'out' args aren't
+        pooled, since they're returned by reference.
+    _aio_limit_ : int, optional
+        Maximum number of concurrent calls made through each instance's ``aio`` namespace. This is
+        in addition to the parent lib's ``_aio_limit_``.
+    _slots_ : bool or sequence of strs, optional
+        If true, instances store only their handles (plus any extra attribute names given) in
+        ``__slots__`` rather than a per-instance ``__dict__``. This makes them smaller and cheaper
+        to create, which helps when you have many short-lived objects.
     """
+    __slots__ = ()
     _init_func = None
     _n_handles = None
+    _aio_limit_ = None
+    aio = _AioAccessor()
 
     def __init__(self, *args):
         handles = self._init_func(*args) if self._init_func else args
@@ -674,31 +1195,185 @@ class NiceObject(with_metaclass(NiceObjectMeta, object)):
             raise TypeError("__init__() takes exactly {} arguments "
                             "({} given)".format(self._n_handles, len(handles)))
 
+    @classmethod
+    def _from_handles(cls, handles):
+        """Wrap each of a sequence of existing handles in an instance of this class
+
+        Unlike normal construction, this doesn't call ``_init_``, so it's useful for wrapping a
+        batch of handles returned by a single C call, e.g. from an ``'arr'`` arg. `handles` can be
+        any iterable, such as a list or a cdata array; use ``ffi.unpack()`` for a bare pointer. For
+        classes with ``_n_handles_`` > 1, each item must be a tuple of handles.
+
+        Returns a list of the new instances.
+        """
+        new = object.__new__
+        objs = []
+        if cls._n_handles == 1:
+            for handle in handles:
+                obj = new(cls)
+                obj._handles = (handle,)
+                objs.append(obj)
+        else:
+            for item in handles:
+                item = tuple(item)
+                if len(item) != cls._n_handles:
+                    raise TypeError("Expected {} handles per object ({} given)"
+                                    .format(cls._n_handles, len(item)))
+                obj = new(cls)
+                obj._handles = item
+                objs.append(obj)
+        return objs
+
+
+class _InstanceInfo(object):
+    """Descriptor for an attribute like ``__doc__`` that is computed from each instance on use
+
+    On the class itself, it gives `class_value` instead, so the class stays introspectable.
+    """
+    def __init__(self, getter, class_value=None):
+        self.getter = getter
+        self.class_value = class_value
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self.class_value
+        return self.getter(instance)
+
 
 class LibMethod(object):
+    __slots__ = ('_niceobj', '_libfunc', '_call', '_use_handle')
+
+    # Bound methods aren't cached on their objects (that would make every object part of a
+    # reference cycle), so keep creating them cheap and compute these only when asked for
+    __doc__ = _InstanceInfo(lambda self: self._libfunc._method_info(self._niceobj._n_handles)[0],
+                            "A LibFunction bound to a NiceObject's handles")
+    __signature__ = _InstanceInfo(
+        lambda self: self._libfunc._method_info(self._niceobj._n_handles)[1])
+
     def __init__(self, niceobj, libfunc):
         self._niceobj = niceobj
         self._libfunc = libfunc
+        self._call = libfunc._call
+        self._use_handle = libfunc._use_handle
+
+    def __call__(self, *args, **kwds):
+        if self._use_handle:
+            args = self._niceobj._handles + args
+        return self._call(args, kwds, self._niceobj)
 
-        nh = niceobj._n_handles
-        sig_str = '{}({}) -> {}'.format(libfunc.name, libfunc.sig.args_py_str(nh),
-                                        libfunc.sig.rets_py_str())
-        c_sig_str = '{}({})'.format(libfunc.c_name, libfunc.sig.args_c_str())
-        self.__doc__ = sig_str + '\n\nOriginal C Function: ' + c_sig_str
+    def call_many(self, arg_iterable, stack=False, max_workers=None):
+        """Call this method once for each set of args in `arg_iterable`
 
-        if sys.version_info >= (3,3):
-            self._assign_signature()
+        The same as `LibFunction.call_many()`, with the object's handles passed as usual.
+        """
+        prefix = self._niceobj._handles if self._use_handle else ()
+        return _call_many(self._libfunc._call_batch, prefix, self._niceobj, arg_iterable, stack,
+                          max_workers)
 
-    def _assign_signature(self):
-        from inspect import Parameter, Signature
-        params = [Parameter(h.c_argname, Parameter.POSITIONAL_OR_KEYWORD)
-                  for h in self._libfunc.sig.in_handlers[self._niceobj._n_handles:]]
-        self.__signature__ = Signature(params)
 
-    def __call__(self, *args, **kwds):
-        if self._libfunc.sig.flags.get('use_handle', True):
-            args = self._niceobj._handles + args
-        return self._libfunc._call(args, kwds, niceobj=self._niceobj)
+def _call_many(call_batch, prefix, niceobj, arg_iterable, stack, max_workers):
+    """Implementation of `LibFunction.call_many()` and `LibMethod.call_many()`"""
+    if max_workers:
+        try:
+            from concurrent.futures import ThreadPoolExecutor
+        except ImportError:
+            raise ImportError("call_many(max_workers=...) requires concurrent.futures, which on "
+                              "Python 2 is provided by the 'futures' package")
+
+        # Give each thread one contiguous chunk, so the calls still run as batches
+        items = list(arg_iterable)
+        chunk_size = -(-len(items) // max_workers) or 1
+        chunks = [items[i:i+chunk_size] for i in range(0, len(items), chunk_size)]
+        with ThreadPoolExecutor(max_workers) as executor:
+            results = [result
+                       for chunk_results in executor.map(
+                           lambda chunk: call_batch(chunk, prefix, niceobj), chunks)
+                       for result in chunk_results]
+    else:
+        results = call_batch(arg_iterable, prefix, niceobj)
+
+    if stack:
+        return _stack_results(results)
+    return results
+
+
+def _stack_results(results):
+    """Stack a list of call results into numpy arrays, one per return value"""
+    import numpy as np
+    if results and isinstance(results[0], tuple):
+        return tuple(np.array(values) for values in zip(*results))
+    return np.array(results)
+
+
+def _is_c_function(ffi, attr):
+    """Whether `attr` of a cffi lib is a function (API-mode libs give builtin functions)"""
+    if isinstance(attr, ffi.CData):
+        return ffi.typeof(attr).kind == 'function'
+    return isinstance(attr, BuiltinFunctionType)
+
+
+class SymbolIndex(object):
+    """Index of the names in a cffi lib, and what kind of thing each one is
+
+    The index is built once per `LibInfo` and shared by every `NiceLib` class that uses it. If the
+    lib module was generated with a precomputed ``symbols`` dict (name to kind), the functions
+    aren't even looked up until they're needed; otherwise each name is looked up in a single pass.
+
+    Attributes
+    ----------
+    kinds : dict
+        Maps each name to ``'function'``, ``'constant'``, or ``'variable'``. Names that were found
+        in the headers but not in the lib itself are left out, except for functions in a
+        precomputed index.
+    values : dict
+        Maps each non-function name to its value.
+    """
+    def __init__(self, ffi, ffilib, kinds=None):
+        self.kinds = {}
+        self.values = {}
+        self._short_names = {}
+
+        if kinds is None:
+            names = dir(ffilib)
+        else:
+            names = [name for name, kind in kinds.items() if kind != 'function']
+            self.kinds.update((name, kind) for name, kind in kinds.items() if kind == 'function')
+
+        for name in names:
+            try:
+                attr = getattr(ffilib, name)
+            except Exception as e:
+                # The error types cffi uses seem to keep changing, so just catch all of them
+                log.info("Name '%s' found in headers, but not this dll: %s", name, e)
+                continue  # This could happen if multiple ffi libs are sharing headers
+
+            if kinds is not None:
+                self.kinds[name] = kinds[name]
+                self.values[name] = attr
+            elif _is_c_function(ffi, attr):
+                self.kinds[name] = 'function'
+            else:
+                self.kinds[name] = 'constant'
+                self.values[name] = attr
+
+    @classmethod
+    def for_info(cls, info):
+        """Get the index of a `LibInfo`, building it the first time"""
+        if info._symbols is None:
+            info._symbols = cls(info._ffi, info._ffilib, info._symbol_kinds)
+        return info._symbols
+
+    def is_function(self, name):
+        return self.kinds.get(name) == 'function'
+
+    def short_names(self, prefixes):
+        """List the (short name, name) pairs of the non-functions, with `prefixes` stripped"""
+        try:
+            return self._short_names[prefixes]
+        except KeyError:
+            pairs = [(unprefix(name, prefixes)[1], name) for name in sorted(self.values)]
+            self._short_names[prefixes] = pairs
+            return pairs
 
 
 def _wrap_inarg(ffi, argtype, arg):
@@ -717,34 +1392,11 @@ def _wrap_inarg(ffi, argtype, arg):
     """
     # For variadic args, we can't rely on cffi auto-converting our arg to the right cdata type, so
     # we do it ourselves instead
-    try:
-        import numpy as np
-        HAS_NUMPY = True
-    except ImportError:
-        HAS_NUMPY = False
-
-    if HAS_NUMPY and isinstance(arg, np.ndarray):
-        if argtype.kind != 'pointer':
-            raise TypeError
-        elif argtype.item.kind != 'primitive':
-            raise TypeError
-
-        cname = argtype.item.cname
-        if cname.startswith(('int', 'long', 'short', 'char', 'signed')):
-            prefix = 'i'
-        elif cname.startswith('unsigned'):
-            prefix = 'u'
-        elif cname.startswith(('float', 'double')):
-            prefix = 'f'
-        else:
-            raise TypeError("Unknown type {}".format(cname))
-
-        dtype = np.dtype(prefix + str(ffi.sizeof(argtype.item)))
-
-        if arg.dtype != dtype:
-            raise TypeError("Got ndarray with dtype {}, but expected {}".format(arg.dtype, dtype))
 
-        return ffi.cast(argtype, arg.ctypes.data)
+    # If numpy hasn't been imported, arg can't be an ndarray; this avoids importing it ourselves
+    np = sys.modules.get('numpy')
+    if np is not None and isinstance(arg, np.ndarray):
+        return _ndarray_to_pointer(ffi, argtype, arg)
 
     elif isinstance(argtype, ffi.CType):
         # Convert strings
@@ -766,6 +1418,94 @@ def _wrap_inarg(ffi, argtype, arg):
         return arg
 
 
+def _ndarray_to_pointer(ffi, argtype, arr, dtype=None):
+    if argtype.kind != 'pointer':
+        raise TypeError
+    elif argtype.item.kind != 'primitive':
+        raise TypeError
+
+    if dtype is None:
+        dtype = numpy_dtype(ffi, argtype.item)
+
+    if arr.dtype != dtype:
+        raise TypeError("Got ndarray with dtype {}, but expected {}".format(arr.dtype, dtype))
+
+    return ffi.cast(argtype, arr.ctypes.data)
+
+
+def _passthrough(arg):
+    return arg
+
+
+INT_TYPES = (int, long) if PY2 else (int,)
+NON_INT_PRIMITIVES = {'char', 'wchar_t', 'char16_t', 'char32_t', '_Bool', 'float', 'double',
+                      'long double', 'float _Complex', 'double _Complex'}
+
+
+def _make_inarg_converter(ffi, argtype):
+    """Choose how to convert input args for a C parameter of type `argtype`
+
+    Returns a function ``convert(arg)``. The strategy is picked once, based on the argtype's kind,
+    and handles the common case for that kind directly (e.g. a Python int that cffi can pass
+    straight through to an ``int`` parameter). Anything else goes through `_wrap_inarg()`, so the
+    result is always the same as that of `_wrap_inarg()`.
+    """
+    def convert_general(arg):
+        return _wrap_inarg(ffi, argtype, arg)
+
+    kind = argtype.kind
+    if kind == 'enum' or (kind == 'primitive' and argtype.cname not in NON_INT_PRIMITIVES):
+        # Passing an int directly is only equivalent to casting it if it doesn't overflow
+        n_bits = 8 * ffi.sizeof(argtype)
+        if int(ffi.cast(argtype, -1)) < 0:
+            min_val, max_val = -(1 << (n_bits - 1)), (1 << (n_bits - 1)) - 1
+        else:
+            min_val, max_val = 0, (1 << n_bits) - 1
+
+        def convert_int(arg):
+            if type(arg) in INT_TYPES and min_val <= arg <= max_val:
+                return arg
+            return convert_general(arg)
+        return convert_int
+
+    elif kind == 'primitive' and argtype.cname in ('float', 'double'):
+        float_types = INT_TYPES + (float,)
+
+        def convert_float(arg):
+            if type(arg) in float_types:
+                return arg
+            return convert_general(arg)
+        return convert_float
+
+    elif argtype.cname in ('char *', 'char[]'):
+        def convert_string(arg):
+            if isinstance(arg, bytes):
+                return ffi.new('char[]', arg)
+            elif isinstance(arg, str):
+                return ffi.new('char[]', arg.encode())
+            return convert_general(arg)
+        return convert_string
+
+    elif kind == 'pointer':
+        CData = ffi.CData
+        dtypes = []  # Computed on first use, since it requires numpy
+
+        def convert_pointer(arg):
+            if isinstance(arg, CData):
+                if ffi.typeof(arg) is argtype:
+                    return arg
+            else:
+                np = sys.modules.get('numpy')
+                if np is not None and isinstance(arg, np.ndarray):
+                    if not dtypes and argtype.item.kind == 'primitive':
+                        dtypes.append(numpy_dtype(ffi, argtype.item))
+                    return _ndarray_to_pointer(ffi, argtype, arg, dtypes[0] if dtypes else None)
+            return convert_general(arg)
+        return convert_pointer
+
+    return convert_general
+
+
 # WARNING uses some stack frame hackery; should probably make use of this syntax optional
 class NiceObjectDef(object):
     def __init__(self, attrs=None, n_handles=1, init=None, doc=None, **flags):
@@ -842,6 +1582,7 @@ class LibMeta(type):
             'buflen': 512,
             'use_numpy': False,
             'free_buf': None,
+            'buf_pool': False,
             'ret': ret_return,
         }
         classdict = {}
@@ -945,11 +1686,11 @@ class LibMeta(type):
             del cls._lib
 
         cls._handle_base_flags()
+        cls._symbols = cls._get_symbol_index()
         cls._add_dir_ffilib()
         cls._create_libfunctions()
         cls._create_niceobject_classes()
         cls._add_enum_constant_defs()
-        cls._add_macro_defs()
 
     def _handle_deprecated_attributes(cls):
         if '_err_wrap' in cls.__dict__:
@@ -977,32 +1718,71 @@ class LibMeta(type):
         if '' not in cls._base_flags['prefix']:
             cls._base_flags['prefix'] += ('',)
 
+    def _get_symbol_index(cls):
+        info = cls.__dict__.get('_info')
+        if info is not None and info._ffilib is cls._ffilib:
+            return SymbolIndex.for_info(info)
+        return SymbolIndex(cls._ffi, cls._ffilib)
+
     def _add_dir_ffilib(cls):
-        for name in dir(cls._ffilib):
-            try:
-                attr = getattr(cls._ffilib, name)
-                if (cls._ffi and isinstance(attr, cls._ffi.CData) and
-                        cls._ffi.typeof(attr).kind != 'function'):
-                    cls._dir_ffilib.append(name)
-            except Exception as e:
-                # The error types cffi uses seem to keep changing, so just catch all of them
-                log.info("Name '%s' found in headers, but not this dll: %s", name, e)
-            log.debug("Handling NiceLib attr '%s'", name)
+        if cls._ffi:
+            cls._dir_ffilib.extend(name for name, value in cls._symbols.values.items()
+                                   if isinstance(value, cls._ffi.CData))
 
     def _create_libfunctions(cls):
         cls._libfuncs = {}
+        cls._unbound_sigs = {}
         for shortname, sig in cls._sigs.items():
-            log.info('Creating libfunc for %s', sig)
             sig.set_default_flags([cls._base_flags])
-            libfunc = cls._create_libfunction(shortname, sig)
-            if libfunc:
-                cls._libfuncs[shortname] = libfunc
-                try:
-                    hybrid_func = cls._hybrid_funcs[shortname]
-                    setattr(cls, '_autofunc_'+shortname, libfunc)
-                    setattr(cls, shortname, classmethod(hybrid_func))
-                except KeyError:
-                    setattr(cls, shortname, libfunc)
+            if cls._lazy_:
+                cls._unbound_sigs[shortname] = sig
+                if shortname in cls._hybrid_funcs:
+                    setattr(cls, '_autofunc_'+shortname, _LazyLibFunction(cls, shortname))
+                    setattr(cls, shortname, classmethod(cls._hybrid_funcs[shortname]))
+                else:
+                    setattr(cls, shortname, _LazyLibFunction(cls, shortname))
+            else:
+                log.info('Creating libfunc for %s', sig)
+                cls._install_libfunction(shortname, cls._create_libfunction(shortname, sig))
+
+    def _install_libfunction(cls, shortname, libfunc):
+        if not libfunc:
+            with suppress(AttributeError):
+                delattr(cls, '_autofunc_'+shortname if shortname in cls._hybrid_funcs else
+                        shortname)
+            return
+
+        cls._libfuncs[shortname] = libfunc
+        try:
+            hybrid_func = cls._hybrid_funcs[shortname]
+            setattr(cls, '_autofunc_'+shortname, libfunc)
+            setattr(cls, shortname, classmethod(hybrid_func))
+        except KeyError:
+            setattr(cls, shortname, libfunc)
+
+    def _bind_libfunction(cls, shortname):
+        return _bind_libfunction(cls, cls, shortname)
+
+    def _prewarm(cls):
+        """Create all of this lib's functions (including NiceObject methods) up front
+
+        With ``_lazy_``, each function is only looked up and set up the first time it's accessed.
+        Call this to do it all in advance instead, e.g. before entering a latency-critical loop.
+        This also computes their docstrings and signatures, which are otherwise built on demand.
+        """
+        cls._bind_all()
+        for libfunc in cls._libfuncs.values():
+            libfunc.__doc__, libfunc.__signature__  # Each is computed on first access
+        for niceobj_cls in cls._niceobj_classes:
+            for libfunc in niceobj_cls._libfuncs.values():
+                libfunc._method_info(niceobj_cls._n_handles)
+
+    def _bind_all(cls):
+        for shortname in list(cls._unbound_sigs):
+            cls._bind_libfunction(shortname)
+        for niceobj_cls in cls._niceobj_classes:
+            for shortname in list(niceobj_cls._unbound_sigs):
+                niceobj_cls._bind_libfunction(shortname)
 
     def _create_libfunction(cls, shortname, sig):
         # Designed to be called by NiceLib and NiceObjectMeta
@@ -1036,57 +1816,136 @@ class LibMeta(type):
     def _find_c_func(cls, shortname, prefixes):
         for prefix in prefixes:
             func_name = prefix + shortname
-            with suppress(AttributeError):
-                return getattr(cls._ffilib, func_name), func_name
+            if cls._symbols.is_function(func_name):
+                with suppress(AttributeError):
+                    return getattr(cls._ffilib, func_name), func_name
 
         raise ValueError("No lib function found with a name ending in '{}', with "
                          "any of these prefixes: {}".format(shortname, prefixes))
 
     def _create_niceobject_classes(cls):
+        cls._niceobj_classes = []
         for niceobj_cls_name, niceobjdef in cls._niceobjectdefs.items():
             niceobj_cls = NiceObjectMeta.from_niceobjectdef(niceobj_cls_name, niceobjdef, cls)
             setattr(cls, niceobj_cls_name, niceobj_cls)
+            cls._niceobj_classes.append(niceobj_cls)
 
         for niceobj_cls_name, niceclass in cls._niceclasses.items():
             niceclass._patch(cls)
             setattr(cls, niceobj_cls_name, niceclass)
+            cls._niceobj_classes.append(niceclass)
 
-    def _add_enum_constant_defs(cls):
-        prefixes = cls._base_flags['prefix']
-        for name in dir(cls._ffilib):
-            try:
-                attr = getattr(cls._ffilib, name)
-            except:
-                # The error types cffi uses seem to keep changing, so just catch all of them
-                log.info("Name '%s' found in headers, but not this dll", name)
-                continue  # This could happen if multiple ffi libs are sharing headers
+    def _iter_libfuncs(cls):
+        """Iterate over (name, LibFunction) pairs of this lib, including those of its NiceObjects
 
-            if not isinstance(attr, cls._ffi.CData) or cls._ffi.typeof(attr).kind != 'function':
-                prefix, shortname = unprefix(name, prefixes)
-                if shortname in cls.__dict__:
-                    warnings.warn("Conflicting name {}, ignoring".format(shortname))
-                else:
-                    setattr(cls, shortname, attr)
-
-    def _add_macro_defs(cls):
-        prefixes = cls._base_flags['prefix']
-        for full_name, attr in cls._defs.items():
-            prefix, name = unprefix(full_name, prefixes)
-            if name in cls.__dict__:
-                warnings.warn("Conflicting name {}, ignoring".format(name))
+        NiceObject methods are named like ``'Item.get_value'``. Any functions that haven't been
+        created yet (see ``_lazy_``) are created first.
+        """
+        cls._bind_all()
+        for name, libfunc in cls._libfuncs.items():
+            yield name, libfunc
+        for niceobj_cls in cls._niceobj_classes:
+            for name, libfunc in niceobj_cls._libfuncs.items():
+                yield niceobj_cls.__name__ + '.' + name, libfunc
+
+    def _set_tracer(cls, tracer):
+        """Set the call tracer of every function in this lib (including NiceObject methods)
+
+        Parameters
+        ----------
+        tracer : callable or None
+            Called after each C function call with a single `CallTrace` argument, which holds the
+            function's name, its Python args, the C args it was called with, the C return value,
+            and the duration of the C call in seconds. Pass None to disable tracing.
+        """
+        for _, libfunc in cls._iter_libfuncs():
+            libfunc._set_tracer(tracer)
+
+    def _enable_stats(cls, enabled=True):
+        """Start or stop collecting call metrics for every function in this lib
+
+        While enabled, each function keeps a `CallStats` with its number of calls and errors, the
+        time spent in the C function, and the bytes of output buffers allocated. Only calls that
+        reach the C function are counted; an error is one raised after it returns, e.g. by the ret
+        handler. Enabling resets any previous stats. See `_stats()`.
+        """
+        for _, libfunc in cls._iter_libfuncs():
+            libfunc._enable_stats(enabled)
+
+    def _enable_profiling(cls, enabled=True):
+        """Start or stop profiling the phases of the calls of every function in this lib
+
+        While enabled, each call's time is broken down into binding the args, converting each arg,
+        the C call itself, the return handler, and extracting outputs. This shows whether a slow
+        call is slow in C or in NiceLib's marshalling. See `_profile()` and `CallProfile`.
+        Enabling resets any previous profile.
+        """
+        for _, libfunc in cls._iter_libfuncs():
+            libfunc._enable_profiling(enabled)
+
+    def _profile(cls, reset=False, table=False):
+        """Get the profiles of this lib's functions that have been called
+
+        Returns a dict mapping function names to the dict given by `CallProfile.snapshot()`, or if
+        `table` is True, a string table of the per-call time of each phase (see
+        `format_profile()`). If `reset` is True, the profiles are reset after being read.
+        """
+        profiles = {name: libfunc._call_profile.snapshot(reset)
+                    for name, libfunc in cls._iter_libfuncs()
+                    if libfunc._call_profile is not None and libfunc._call_profile.calls}
+        return format_profile(profiles) if table else profiles
+
+    def _stats(cls, reset=False):
+        """Get a snapshot of the call metrics of this lib's functions
+
+        Returns a dict mapping function names (NiceObject methods are named like
+        ``'Item.get_value'``) to the dict given by `CallStats.snapshot()`. Only functions that have
+        been called are included. If `reset` is True, the stats are reset after being read.
+        """
+        return {name: libfunc._call_stats.snapshot(reset)
+                for name, libfunc in cls._iter_libfuncs()
+                if libfunc._call_stats is not None and
+                (libfunc._call_stats.calls or libfunc._call_stats.errors)}
+
+    def _add_enum_constant_defs(cls):
+        values = cls._symbols.values
+        for shortname, name in cls._symbols.short_names(cls._base_flags['prefix']):
+            if shortname in cls.__dict__:
+                warnings.warn("Conflicting name {}, ignoring".format(shortname))
             else:
-                macro = staticmethod(attr) if callable(attr) else attr
-                setattr(cls, name, macro)
+                setattr(cls, shortname, values[name])
+
+    def _find_macro_def(cls, name):
+        """Look up the macro whose name is `name` after prefix removal, caching it on the class
+
+        Macros are only evaluated when first used, since libs can define many thousands of them.
+        Names the class already has (e.g. functions and enum constants) take precedence.
+        """
+        defs = cls._defs
+        for prefix in cls._base_flags['prefix']:
+            full_name = prefix + name
+            if full_name in defs:
+                attr = defs[full_name]
+                setattr(cls, name, staticmethod(attr) if callable(attr) else attr)
+                return attr
+        raise KeyError(name)
 
     def __getattr__(cls, name):
         log.debug("Getting attr '%s' from %s...", name, cls)
+        if cls._defs:
+            with suppress(KeyError):
+                return cls._find_macro_def(name)
         try:
             return getattr(cls._ffilib, name)
         except Exception:
             raise AttributeError("{} has no attribute named '{}'".format(cls.__name__, name))
 
     def __dir__(self):
-        return list(self.__dict__.keys()) + self._dir_ffilib
+        names = set(self.__dict__.keys())
+        if self._defs:
+            prefixes = self._base_flags['prefix']
+            names.update(unprefix(full_name, prefixes)[1] for full_name in self._defs)
+        return list(names) + self._dir_ffilib
 
 
 def _func_repr_str(ffi, func, n_handles=0):
@@ -1115,60 +1974,323 @@ def unprefix(name, prefixes):
 
 
 class LibFunction(object):
+    _instrumented = False  # Whether calls go through the slower path that feeds the below
+    _tracer = None
+    _call_stats = None
+    _call_profile = None
+
     def __init__(self, name, c_name, sig, c_func):
         self.sig = sig
         self.name = name
         self.c_name = c_name
         self.c_func = c_func
 
-        sig_str = '{}({}) -> {}'.format(name, sig.args_py_str(), sig.rets_py_str())
-        c_sig_str = '{}({})'.format(c_name, sig.args_c_str())
-        self.__doc__ = sig_str + '\n\nOriginal C Function: ' + c_sig_str
+        self._use_handle = sig.flags.get('use_handle', True)
+        self._method_infos = {}
+        self._call, self._call_batch = self._make_call()
+
+    # Computed on first use, since most functions of a large lib are never inspected. These are
+    # descriptors rather than properties so that the class itself still has a normal __doc__ and
+    # __signature__.
+    __doc__ = _InstanceInfo(lambda self: self._method_info(0)[0],
+                            "A function of a NiceLib, which wraps a C function")
+    __signature__ = _InstanceInfo(lambda self: self._method_info(0)[1])
+
+    def _method_info(self, n_handles):
+        """Get the (docstring, signature) of a LibMethod that binds `n_handles` handles
+
+        These are the same for every instance of a NiceObject class, so they're only computed once.
+        The LibFunction's own are those for ``n_handles=0``.
+        """
+        try:
+            return self._method_infos[n_handles]
+        except KeyError:
+            pass
+
+        sig_str = '{}({}) -> {}'.format(self.name, self.sig.args_py_str(n_handles),
+                                        self.sig.rets_py_str())
+        c_sig_str = '{}({})'.format(self.c_name, self.sig.args_c_str())
+        doc = sig_str + '\n\nOriginal C Function: ' + c_sig_str
 
         if sys.version_info >= (3,3):
-            self._assign_signature()
+            from inspect import Parameter, Signature
+            params = [Parameter(h.c_argname, Parameter.POSITIONAL_OR_KEYWORD)
+                      for h in self.sig.in_handlers[n_handles:]]
+            signature = Signature(params)
+        else:
+            signature = None
 
-    def _assign_signature(self):
-        from inspect import Parameter, Signature
-        params = [Parameter(h.c_argname, Parameter.POSITIONAL_OR_KEYWORD)
-                  for h in self.sig.in_handlers]
-        self.__signature__ = Signature(params)
+        info = self._method_infos[n_handles] = (doc, signature)
+        return info
 
     def __get__(self, instance, owner):
         if instance is None:
             return self
-        else:
-            return LibMethod(instance, self)
+        return LibMethod(instance, self)
 
     def __call__(self, *args, **kwds):
         return self._call(args, kwds)
 
-    def _call(self, args, kwds, niceobj=None):
-        if sys.version_info >= (3,3):
-            bound_args = self.__signature__.bind(*args, **kwds)
-            args = bound_args.args
-        elif kwds:
-            raise TypeError('Keyword args in LibFunctions are not supported for Python versions '
-                            'before 3.3')
-
-        check_num_args(self.name, len(args), self.sig.num_inargs, self.sig.variadic)
-
-        if len(args) != self.sig.num_inargs:
-            raise TypeError("{}() takes {} arguments ({} given)"
-                            "".format(self.name, self.sig.num_inargs, len(args)))
-
-        c_args = self.sig.make_c_args(args)
-        # TODO: Add a custom object for logging these messages, to allow both filtering
-        # and to avoid this text formatting unless it's needed
-        log.info('Calling {}({})'.format(self.name, ', '.join(repr(arg) for arg in args)))
-        retval = self.c_func(*c_args)
-
-        ret_handler_args = {
-            'niceobj': niceobj,
-            'funcname': self.name,
-            'funcargs': c_args,
-        }
-        return self.sig.extract_outputs(c_args, retval, ret_handler_args)
+    def call_many(self, arg_iterable, stack=False, max_workers=None):
+        """Call this function once for each set of args in `arg_iterable`
+
+        Each item of `arg_iterable` is a tuple of positional args, or a single non-tuple arg for
+        functions that take just one. This is equivalent to calling the function in a loop, but
+        the checks that are the same for every call are made once for the whole batch, and the
+        args are converted without going through keyword binding.
+
+        Parameters
+        ----------
+        arg_iterable : iterable
+            The args for each call.
+        stack : bool, optional
+            If True, stack the results into numpy arrays instead of returning a list. Functions
+            with several return values give a tuple of arrays, one per return value.
+        max_workers : int, optional
+            If given, make the calls from a pool of this many threads. Only use this if the
+            underlying library is thread-safe.
+
+        Returns
+        -------
+        A list of the results of each call, in order, or numpy arrays if `stack` is True. Note that
+        with the ``buf_pool`` flag, ``'arr'`` outputs may share memory between calls.
+        """
+        return _call_many(self._call_batch, (), None, arg_iterable, stack, max_workers)
+
+    def _make_call(self):
+        """Build the ``_call(args, kwds, niceobj=None)`` function for this LibFunction
+
+        Also builds ``_call_batch(arg_iterable, prefix, niceobj)``, which makes one call per item of
+        `arg_iterable` and returns a list of the results.
+
+        The function is specialized for this LibFunction's `Sig`: everything that doesn't depend on
+        the arguments of a particular call (the handler plan, the resolved flags, and which of the
+        optional steps are needed at all) is worked out once, here, rather than on every call.
+        """
+        libfunc = self
+        name = self.name
+        c_func = self.c_func
+        sig = self.sig
+        ffi = sig.ffi
+        handlers = sig.handlers
+        num_inargs = sig.num_inargs
+        variadic = sig.variadic
+        ret_handler = sig.ret_handler
+        has_outputs = bool(sig.out_handlers)
+        bind_args = self._make_bind_args()
+
+        # Output buffers that NiceLib allocates, for CallStats
+        out_indices = [i for i, h in enumerate(handlers) if h.makes_output and not h.takes_input]
+
+        def sizeof_output(c_arg):
+            try:
+                return len(ffi.buffer(c_arg))
+            except (TypeError, ffi.error):
+                return 0
+
+        if ret_handler:
+            ret_func, ret_takes_context = ret_handler.compile(name)
+            discard_retval = ret_func is None
+        else:
+            ret_func, ret_takes_context, discard_retval = None, False, False
+
+        # Plain inputs need neither per-call state nor a second pass, so convert them directly
+        plain_inputs = all(h.takes_input and not (h.makes_output or h.defers_c_arg)
+                           for h in handlers)
+
+        def make_plain_c_args(args):
+            c_args = []
+            for handler, py_arg in zip(handlers, args):
+                try:
+                    c_args.append(handler.make_c_arg(ffi, py_arg, None))
+                except TypeError as e:
+                    raise sig.c_arg_error(handler, py_arg, e)
+            return c_args
+
+        def prepare(args, kwds):
+            if kwds or len(args) != num_inargs:
+                args = bind_args(args, kwds)
+
+            if plain_inputs:
+                return args, make_plain_c_args(args), None
+            state = {}
+            return args, sig.make_c_args(args, state), state
+
+        def handle_ret(retval, c_args, niceobj):
+            if ret_func is not None:
+                if ret_takes_context:
+                    return ret_func(retval, niceobj, c_args)
+                return ret_func(retval)
+            elif discard_retval:
+                return None
+            return retval
+
+        def finish(retval, c_args, state, niceobj):
+            if has_outputs:
+                out_vals = sig.extract_out_vals(c_args, state)
+                return sig.combine_outputs(out_vals, handle_ret(retval, c_args, niceobj))
+            return handle_ret(retval, c_args, niceobj)
+
+        def profiled_prepare(args, kwds, profile):
+            start = default_timer()
+            if kwds or len(args) != num_inargs:
+                args = bind_args(args, kwds)
+            profile.add('bind', default_timer() - start)
+
+            # The same handler calls as prepare() makes, timed one by one
+            state = None if plain_inputs else {}
+            return args, sig.make_c_args(args, state, profile), state
+
+        def profiled_finish(retval, c_args, state, niceobj, profile):
+            if has_outputs:
+                start = default_timer()
+                out_vals = sig.extract_out_vals(c_args, state)
+                profile.add('outputs', default_timer() - start)
+
+            start = default_timer()
+            retval = handle_ret(retval, c_args, niceobj)
+            profile.add('ret', default_timer() - start)
+
+            if has_outputs:
+                return sig.combine_outputs(out_vals, retval)
+            return retval
+
+        def _call(args, kwds, niceobj=None):
+            if libfunc._instrumented:
+                return instrumented_call(args, kwds, niceobj)
+            args, c_args, state = prepare(args, kwds)
+            return finish(c_func(*c_args), c_args, state, niceobj)
+
+        def instrumented_call(args, kwds, niceobj):
+            tracer = libfunc._tracer
+            stats = libfunc._call_stats
+            profile = libfunc._call_profile
+            # Bad args never reach C, so they don't count as calls (or errors)
+            if profile is None:
+                args, c_args, state = prepare(args, kwds)
+            else:
+                args, c_args, state = profiled_prepare(args, kwds, profile)
+
+            start = default_timer()
+            retval = c_func(*c_args)
+            duration = default_timer() - start
+
+            try:
+                if tracer is not None:
+                    tracer(CallTrace(name, args, c_args, retval, duration))
+
+                if profile is None:
+                    result = finish(retval, c_args, state, niceobj)
+                else:
+                    profile.add('C call', duration)
+                    result = profiled_finish(retval, c_args, state, niceobj, profile)
+            except Exception:
+                if stats is not None:
+                    stats.add_error()
+                raise
+            finally:
+                if stats is not None:
+                    stats.add_call(duration, sum(sizeof_output(c_args[i]) for i in out_indices))
+
+            if profile is not None:
+                profile.add_call()
+            return result
+
+        plain_makers = [handler.make_c_arg for handler in handlers]
+
+        def _call_batch(arg_iterable, prefix, niceobj):
+            if libfunc._instrumented:
+                return [instrumented_call(prefix + (args if isinstance(args, tuple) else (args,)),
+                                          {}, niceobj)
+                        for args in arg_iterable]
+
+            results = []
+            append = results.append
+            for args in arg_iterable:
+                args = prefix + (args if isinstance(args, tuple) else (args,))
+                if len(args) != num_inargs:
+                    args = bind_args(args, {})
+
+                if plain_inputs:
+                    try:
+                        c_args = [make(ffi, py_arg, None)
+                                  for make, py_arg in zip(plain_makers, args)]
+                    except TypeError:
+                        make_plain_c_args(args)  # Raises the error for the offending arg
+                        raise
+                    state = None
+                else:
+                    state = {}
+                    c_args = sig.make_c_args(args, state)
+                append(finish(c_func(*c_args), c_args, state, niceobj))
+            return results
+
+        return _call, _call_batch
+
+    def _set_tracer(self, tracer):
+        """Set a callable to be called with a `CallTrace` after each call, or None to disable"""
+        self._tracer = tracer
+        self._update_instrumented()
+
+    def _enable_stats(self, enabled=True):
+        """Start (or stop) collecting `CallStats` for this function. Starting resets them."""
+        self._call_stats = CallStats() if enabled else None
+        self._update_instrumented()
+
+    def _enable_profiling(self, enabled=True):
+        """Start (or stop) collecting a `CallProfile` for this function. Starting resets it."""
+        self._call_profile = CallProfile() if enabled else None
+        self._update_instrumented()
+
+    def _update_instrumented(self):
+        self._instrumented = (self._tracer is not None or self._call_stats is not None or
+                              self._call_profile is not None)
+
+    def _make_bind_args(self):
+        """Build the function that binds a call's args and kwds to a tuple of positional args
+
+        This is only needed when a call uses keywords or the wrong number of args. Keywords that
+        simply fill in the remaining parameters are placed using a precomputed name-to-position
+        map; anything else goes through ``Signature.bind()`` and the usual arg-count checks so that
+        errors are reported just as before.
+        """
+        name = self.name
+        num_inargs = self.sig.num_inargs
+        variadic = self.sig.variadic
+        positions = {h.c_argname: i for i, h in enumerate(self.sig.in_handlers)}
+        has_signature = sys.version_info >= (3,3)
+        libfunc = self
+
+        def bind_args(args, kwds):
+            if has_signature and kwds and len(args) + len(kwds) == num_inargs:
+                bound = list(args) + [_MISSING] * len(kwds)
+                for argname, value in kwds.items():
+                    pos = positions.get(argname)
+                    if pos is None or bound[pos] is not _MISSING:
+                        break
+                    bound[pos] = value
+                else:
+                    return tuple(bound)
+
+            if has_signature:
+                args = libfunc.__signature__.bind(*args, **kwds).args
+            elif kwds:
+                raise TypeError('Keyword args in LibFunctions are not supported for Python '
+                                'versions before 3.3')
+
+            if len(args) != num_inargs:
+                check_num_args(name, len(args), num_inargs, variadic)
+                raise TypeError("{}() takes {} arguments ({} given)"
+                                "".format(name, num_inargs, len(args)))
+            return args
+
+        return bind_args
+
+
+def log_call(trace):
+    """Call tracer that logs each call at the INFO level. See `LibMeta._set_tracer()`."""
+    log.info('Calling %s(%s) -> %r [%.1f us]', trace.name,
+             ', '.join(repr(arg) for arg in trace.args), trace.retval, trace.duration * 1e6)
 
 
 def check_num_args(func_name, num_args, num_req_args, is_variadic):
@@ -1231,12 +2353,34 @@ class NiceLib(with_metaclass(LibMeta, object)):
         The default length for buffers. This can be overridden on a per-argument basis in the
         argument's spec string, e.g ``'len=64'`` will make a 64-byte buffer.
     _use_numpy_ : bool, optional
-        If true, convert output args marked as 'arr' to ``numpy`` arrays. Obviously requires
-        ``numpy`` to be installed.
+        If true, convert output args marked as 'arr' to ``numpy`` arrays, and struct 'out' args to
+        structured scalars. Obviously requires ``numpy`` to be installed.
+    _buf_pool_ : bool or str, optional
+        If true, reuse the buffers allocated for 'out', 'arr', 'buf', and 'bufout' args across
+        calls instead of allocating new ones each time. Only 'arr' buffers keep the previous call's
+        contents. With True (or ``'alias'``), arrays returned for 'arr' args share memory with the
+        pooled buffer, so they are only valid until the next call of the same function in the same
+        thread. With ``'copy'``, they are copied out first. Struct and array 'out' args aren't
+        pooled, since they're returned by reference.
+    _aio_executor_ : concurrent.futures.Executor, optional
+        Executor in which calls made through the ``aio`` namespace are run. Defaults to the event
+        loop's default executor.
+    _aio_limit_ : int, optional
+        Maximum number of concurrent calls made through the ``aio`` namespace, including those of
+        this lib's NiceObjects.
+    _lazy_ : bool, optional
+        If true, each function (and NiceObject method) is only looked up in the library and set up
+        the first time it's accessed, rather than when the class is defined. This speeds up
+        importing wrappers of large libraries. Functions that can't be found then raise
+        ``AttributeError`` on access instead of logging a warning up front. Call ``_prewarm()`` to
+        set up all of them at once.
     """
     _ffi = None  # MUST be filled in by subclass
     _ffilib = None  # MUST be filled in by subclass
     _defs = {}
+    _lazy_ = False
+    _aio_executor_ = None
+    _aio_limit_ = None
 
     @RetHandler(num_retvals=1)
     def _ret_return(retval):
@@ -1245,6 +2389,11 @@ class NiceLib(with_metaclass(LibMeta, object)):
     @RetHandler(num_retvals=0)
     def _ret_ignore(retval):
         pass
+    _ret_ignore.discards_retval = True
 
     def __new__(cls):
         raise TypeError("Not allowed to instantiate {}. Use the class directly".format(cls))
+
+
+# Set after class creation, since LibMeta would treat it as a sig
+NiceLib.aio = _AioAccessor()
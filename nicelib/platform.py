@@ -7,10 +7,11 @@
 import os
 import sys
 import glob
+import json
 import logging
 from fnmatch import fnmatch
 
-__all__ = ['PREDEF_MACRO_STR', 'INCLUDE_DIRS']
+__all__ = ['PREDEF_MACRO_STR', 'INCLUDE_DIRS', 'get_include_dirs']
 log = logging.getLogger(__name__)
 
 is_64bit = sys.maxsize > 2**32
@@ -26,36 +27,38 @@ if fnmatch(sys.platform, 'linux*'):
         #define __gnu_linux__ 1
         #define __STDC__ 1
     """
-    INCLUDE_DIRS = ['/usr/include',
-                    '/usr/lib/gcc/*/*/include-fixed',
-                    '/usr/local/include',
-                    '/usr/lib/gcc/*/*/include']
+    INCLUDE_DIR_TEMPLATES = ['/usr/include',
+                             '/usr/lib/gcc/*/*/include-fixed',
+                             '/usr/local/include',
+                             '/usr/lib/gcc/*/*/include']
     COMPILER = 'GCC'
 
 elif fnmatch(sys.platform, 'darwin*'):
     PREDEF_MACRO_STR = """
         #define __APPLE__ 1
     """
-    INCLUDE_DIRS = ['/usr/include', '/usr/local/include']
+    INCLUDE_DIR_TEMPLATES = ['/usr/include', '/usr/local/include']
     COMPILER = 'GCC'
 
 elif fnmatch(sys.platform, 'win*'):
     PREDEF_MACRO_STR = """
         #define _WIN32 1
     """
-    INCLUDE_DIRS = [r'{PROGRAMFILES}\Windows Kits\*\Include\*',
-                    r'{PROGRAMFILES}\Windows Kits\*\Include\*\*',
-                    r'{PROGRAMFILES}\Windows Kits\*\Include\*\*\*',
-                    r'{PROGRAMFILES}\Microsoft Visual Studio *\VC\include',
-                    r'{PROGRAMFILES}\Microsoft Visual Studio *\VC\include\*',
-                    r'{PROGRAMFILES}\Microsoft Visual Studio *\VC\include\*\*',
-                    r'{PROGRAMFILES(X86)}\Windows Kits\*\Include\*',
-                    r'{PROGRAMFILES(X86)}\Windows Kits\*\Include\*\*',
-                    r'{PROGRAMFILES(X86)}\Windows Kits\*\Include\*\*\*',
-                    r'{PROGRAMFILES(X86)}\Microsoft Visual Studio *\VC\include',
-                    r'{PROGRAMFILES(X86)}\Microsoft Visual Studio *\VC\include\*',
-                    r'{PROGRAMFILES(X86)}\Microsoft Visual Studio *\VC\include\*\*',
-                    r'{PROGRAMFILES(X86)}\Microsoft Visual Studio\*\Community\VC\Tools\MSVC\*\include']
+    INCLUDE_DIR_TEMPLATES = [
+        r'{PROGRAMFILES}\Windows Kits\*\Include\*',
+        r'{PROGRAMFILES}\Windows Kits\*\Include\*\*',
+        r'{PROGRAMFILES}\Windows Kits\*\Include\*\*\*',
+        r'{PROGRAMFILES}\Microsoft Visual Studio *\VC\include',
+        r'{PROGRAMFILES}\Microsoft Visual Studio *\VC\include\*',
+        r'{PROGRAMFILES}\Microsoft Visual Studio *\VC\include\*\*',
+        r'{PROGRAMFILES(X86)}\Windows Kits\*\Include\*',
+        r'{PROGRAMFILES(X86)}\Windows Kits\*\Include\*\*',
+        r'{PROGRAMFILES(X86)}\Windows Kits\*\Include\*\*\*',
+        r'{PROGRAMFILES(X86)}\Microsoft Visual Studio *\VC\include',
+        r'{PROGRAMFILES(X86)}\Microsoft Visual Studio *\VC\include\*',
+        r'{PROGRAMFILES(X86)}\Microsoft Visual Studio *\VC\include\*\*',
+        r'{PROGRAMFILES(X86)}\Microsoft Visual Studio\*\Community\VC\Tools\MSVC\*\include',
+    ]
 
     if is_64bit:
         PREDEF_MACRO_STR += """
@@ -115,19 +118,114 @@ elif COMPILER == 'MSVC':
 
 def fill_and_glob_dirs(dir_templates):
     dirs = []
+    for filled_dir in _fill_templates(dir_templates):
+        dirs.extend(glob.glob(filled_dir))
+    return dirs
+
+
+def _fill_templates(dir_templates):
+    """Fill in the environment variables of each template, skipping those that aren't set"""
+    filled = []
     for dir_template in dir_templates:
         try:
-            filled_dir = dir_template.format(**os.environ)
+            filled.append(dir_template.format(**os.environ))
         except KeyError as e:
-            # Log instead of warn b/c this gets run every time nicelib is imported, and we trust
-            # the INCLUDE_DIRS defined in this file. If this function ever gets used by other
-            # code, it might be worthwhile to add a 'warn_missing' option
+            # Log instead of warn b/c we trust the templates defined in this file, and this gets
+            # run whenever the include dirs aren't already cached. If this function ever gets used
+            # by other code, it might be worthwhile to add a 'warn_missing' option
             log.info("os.environ does not provide key '%s'", e.args[0])
-            continue
+    return filled
 
-        dirs.extend(glob.glob(filled_dir))
-    return dirs
+
+_include_dirs = None
 
 
-# Glob the include dirs into a flattened list
-INCLUDE_DIRS = fill_and_glob_dirs(INCLUDE_DIRS)
+def get_include_dirs(cache_file=None):
+    """Get the system include dirs, globbing them from ``INCLUDE_DIR_TEMPLATES`` on first use
+
+    The result is memoized for the rest of the process. It can also be persisted across processes
+    in a small JSON file, given by `cache_file` or else the ``NICELIB_INCLUDE_CACHE`` environment
+    variable. The cached dirs are used only if the templates are unchanged and none of the
+    directories the globbing looked in have been modified since.
+    """
+    global _include_dirs
+    if _include_dirs is None:
+        cache_file = cache_file or os.environ.get('NICELIB_INCLUDE_CACHE')
+        _include_dirs = _load_include_dirs(cache_file) if cache_file else None
+        if _include_dirs is None:
+            _include_dirs = fill_and_glob_dirs(INCLUDE_DIR_TEMPLATES)
+            if cache_file:
+                _save_include_dirs(cache_file, _include_dirs)
+    return _include_dirs
+
+
+def _dir_stamps(patterns):
+    """Get the `_stamp` of each dir that globbing `patterns` looks in
+
+    Adding or removing anything that would change a pattern's matches modifies one of these.
+    """
+    stamps = {}
+    for pattern in patterns:
+        parent = os.path.dirname(pattern)
+        while glob.has_magic(parent):
+            for dirpath in glob.glob(parent):
+                stamps[dirpath] = _stamp(dirpath)
+            parent = os.path.dirname(parent)
+        stamps[parent] = _stamp(parent)  # The non-wildcard root, whose contents are listed
+    return stamps
+
+
+def _stamp(path):
+    """Get a dir's [mtime in ns, size, link count], or None if it's missing
+
+    The full-resolution mtime avoids float rounding, and the size and link count catch some
+    changes that filesystems with coarse (1-2 s) mtimes would otherwise miss.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    mtime_ns = getattr(st, 'st_mtime_ns', None)  # Python 3.3+
+    if mtime_ns is None:
+        mtime_ns = int(st.st_mtime * 1e9)
+    return [mtime_ns, st.st_size, st.st_nlink]
+
+
+def _load_include_dirs(cache_file):
+    try:
+        with open(cache_file) as f:
+            cache = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+    if cache.get('patterns') != _fill_templates(INCLUDE_DIR_TEMPLATES):
+        return None
+    stamps = cache.get('stamps')
+    if stamps is None:
+        return None  # Written by an older version
+    for dirpath, stamp in stamps.items():
+        if _stamp(dirpath) != stamp:
+            return None
+
+    log.info("Loaded include dirs from cache file '%s'", cache_file)
+    return cache['dirs']
+
+
+def _save_include_dirs(cache_file, dirs):
+    patterns = _fill_templates(INCLUDE_DIR_TEMPLATES)
+    cache = {'patterns': patterns, 'dirs': dirs, 'stamps': _dir_stamps(patterns)}
+    try:
+        with open(cache_file, 'w') as f:
+            json.dump(cache, f)
+    except (IOError, OSError) as e:
+        log.info("Could not write include dir cache file '%s': %s", cache_file, e)
+
+
+if sys.version_info >= (3, 7):
+    # Provide INCLUDE_DIRS lazily, so that importing this module doesn't touch the filesystem
+    def __getattr__(name):
+        if name == 'INCLUDE_DIRS':
+            return get_include_dirs()
+        raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+else:
+    INCLUDE_DIRS = get_include_dirs()
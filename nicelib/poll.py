@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""Fixed-rate polling of library functions on a background thread"""
+from __future__ import division, absolute_import, with_statement, print_function, unicode_literals
+
+import math
+import threading
+from timeit import default_timer
+from collections import namedtuple, deque
+
+__all__ = ['Poller', 'Subscription', 'Sample']
+
+#: A single result of a polled function. `time` is when the call started (`timeit.default_timer`).
+Sample = namedtuple('Sample', ['time', 'value'])
+
+DROP_POLICIES = ('oldest', 'newest', 'block')
+
+
+class Subscription(object):
+    """Bounded queue of the `Sample`\\s published by a `Poller`, for a single reader
+
+    Create these via `Poller.subscribe()`.
+    """
+    def __init__(self, maxsize, drop):
+        if drop not in DROP_POLICIES:
+            raise ValueError("drop must be one of {}".format(', '.join(DROP_POLICIES)))
+        self.maxsize = maxsize
+        self.drop = drop
+        #: Number of samples dropped because the queue was full
+        self.n_dropped = 0
+        self._samples = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def _put(self, sample):
+        with self._cond:
+            if self.maxsize and len(self._samples) >= self.maxsize:
+                if self.drop == 'oldest':
+                    self._samples.popleft()
+                    self.n_dropped += 1
+                elif self.drop == 'newest':
+                    self.n_dropped += 1
+                    return
+                else:
+                    while len(self._samples) >= self.maxsize and not self._closed:
+                        self._cond.wait()
+            self._samples.append(sample)
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """Remove and return the oldest sample, waiting up to `timeout` seconds for one
+
+        Raises `TimeoutError` (``IOError`` on Python 2) if none arrives in time.
+        """
+        deadline = None if timeout is None else default_timer() + timeout
+        with self._cond:
+            # The condition is shared with the poller and any other readers, so a wakeup doesn't
+            # necessarily mean there's a sample for us
+            while not self._samples:
+                remaining = _remaining(deadline)
+                if self._closed or remaining == 0.:
+                    raise _TimeoutError("No sample received")
+                self._cond.wait(remaining)
+            sample = self._samples.popleft()
+            self._cond.notify_all()
+            return sample
+
+    def get_all(self):
+        """Remove and return all queued samples, without waiting"""
+        with self._cond:
+            samples = list(self._samples)
+            self._samples.clear()
+            self._cond.notify_all()
+            return samples
+
+    def __len__(self):
+        return len(self._samples)
+
+    def _close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class Poller(object):
+    """Call a function at a fixed rate from a background thread, and publish the results
+
+    Any number of readers can share one `Poller` instead of each making their own calls. The most
+    recent result is always available via `latest()`, and readers that need every result can each
+    `subscribe()` to get their own bounded queue::
+
+        with Poller(stage.get_position, period=0.01) as poller:
+            position = poller.latest().value
+
+    Calls are scheduled at multiples of `period` after the start. If a call overruns, the missed
+    slots are skipped (and counted) rather than made up with a burst of calls. If the function
+    raises an exception, it's counted and kept as `last_error`, and polling continues.
+
+    Parameters
+    ----------
+    func : callable
+        The function to poll, typically a `LibFunction` or `LibMethod`.
+    period : float
+        Time between calls, in seconds.
+    args : sequence, optional
+        Args to pass to `func` on each call.
+    start : bool, optional
+        Whether to start polling right away. Otherwise, call `start()`.
+    """
+    def __init__(self, func, period, args=(), start=True):
+        self.func = func
+        self.period = period
+        self.args = tuple(args)
+        self.last_error = None
+
+        self._latest = None
+        self._latest_cond = threading.Condition()
+        self._subscriptions = []
+        self._subs_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._reset_stats()
+
+        if start:
+            self.start()
+
+    def _reset_stats(self):
+        # Called with _stats_lock held, or before the thread has started
+        self.n_calls = 0
+        self.n_errors = 0
+        self.n_overruns = 0
+        self._first_time = None
+        self._last_time = None
+        self._n_intervals = 0
+        self._sum_sq_dev = 0.
+        self._max_dev = 0.
+
+    def start(self):
+        """Start polling, if not already started"""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='nicelib-poller')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop polling and wait for the current call (if any) to finish"""
+        self._stopping.set()
+        with self._subs_lock:
+            for sub in self._subscriptions:
+                sub._close()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def subscribe(self, maxsize=0, drop='oldest'):
+        """Get a new `Subscription` that receives every subsequent sample
+
+        Parameters
+        ----------
+        maxsize : int, optional
+            Maximum number of queued samples, or 0 for no limit.
+        drop : str, optional
+            What to do with a new sample when the queue is full: ``'oldest'`` drops the oldest
+            queued sample, ``'newest'`` drops the new one, and ``'block'`` makes the poller wait
+            for the reader (delaying all other readers too).
+        """
+        sub = Subscription(maxsize, drop)
+        with self._subs_lock:
+            self._subscriptions.append(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._subs_lock:
+            self._subscriptions.remove(sub)
+        sub._close()
+
+    def latest(self):
+        """The most recent `Sample`, or None if there hasn't been one yet"""
+        return self._latest
+
+    def wait_next(self, timeout=None):
+        """Wait for the next sample and return it
+
+        Raises `TimeoutError` (``IOError`` on Python 2) if none arrives within `timeout` seconds.
+        """
+        deadline = None if timeout is None else default_timer() + timeout
+        with self._latest_cond:
+            current = self._latest
+            while self._latest is current:
+                remaining = _remaining(deadline)
+                if remaining == 0.:
+                    raise _TimeoutError("No sample received")
+                self._latest_cond.wait(remaining)
+            return self._latest
+
+    def stats(self, reset=False):
+        """Get the achieved polling rate and timing jitter
+
+        Returns a dict with the number of ``'calls'``, ``'errors'`` and ``'overruns'`` (skipped
+        slots), the mean achieved ``'rate'`` in Hz, and the jitter of the call start times with
+        respect to their schedule: its RMS ``'jitter_rms'`` and maximum ``'jitter_max'``, both in
+        seconds.
+        """
+        with self._stats_lock:
+            elapsed = (self._last_time - self._first_time) if self._n_intervals else 0.
+            stats = {
+                'calls': self.n_calls,
+                'errors': self.n_errors,
+                'overruns': self.n_overruns,
+                'rate': self._n_intervals / elapsed if elapsed else 0.,
+                'jitter_rms': (math.sqrt(self._sum_sq_dev / self._n_intervals)
+                               if self._n_intervals else 0.),
+                'jitter_max': self._max_dev,
+            }
+            if reset:
+                self._reset_stats()
+        return stats
+
+    def _run(self):
+        period = self.period
+        next_time = default_timer()
+        while not self._stopping.is_set():
+            start = default_timer()
+            with self._stats_lock:
+                self._record_start(start, start - next_time)
+            try:
+                value = self.func(*self.args)
+            except Exception as e:
+                error = True
+                self.last_error = e
+            else:
+                error = False
+                self._publish(Sample(start, value))
+
+            next_time += period
+            now = default_timer()
+            missed = int(math.ceil((now - next_time) / period)) if now > next_time else 0
+            next_time += missed * period
+            with self._stats_lock:
+                self.n_calls += 1
+                self.n_errors += error
+                self.n_overruns += missed
+            self._stopping.wait(next_time - now)
+
+    def _record_start(self, start, deviation):
+        if self._first_time is None:
+            self._first_time = start
+        else:
+            self._n_intervals += 1
+            self._sum_sq_dev += deviation * deviation
+            self._max_dev = max(self._max_dev, abs(deviation))
+        self._last_time = start
+
+    def _publish(self, sample):
+        with self._latest_cond:
+            self._latest = sample
+            self._latest_cond.notify_all()
+        with self._subs_lock:
+            subscriptions = list(self._subscriptions)
+        for sub in subscriptions:
+            sub._put(sample)
+
+
+def _remaining(deadline):
+    """Seconds left until `deadline` (at least 0.), or None if there is no deadline"""
+    if deadline is None:
+        return None
+    return max(deadline - default_timer(), 0.)
+
+
+try:
+    _TimeoutError = TimeoutError
+except NameError:
+    _TimeoutError = IOError  # Python 2
@@ -23,7 +23,7 @@ from .parser import cpp_parser, cpp_generator
 from pycparser import c_ast, plyparser
 import cffi
 import cffi.commontypes
-from .platform import PREDEF_MACRO_STR, REPLACEMENT_MAP, INCLUDE_DIRS
+from .platform import PREDEF_MACRO_STR, REPLACEMENT_MAP, get_include_dirs
 from .util import handle_header_path
 
 if sys.version_info < (3,3):
@@ -36,7 +36,27 @@ if PY2:
     range = xrange
 
 log = logging.getLogger(__name__)
-cparser = cpp_parser.CPPParser()
+_cparser = None
+
+
+def get_cparser():
+    """Get the shared `CPPParser`, creating it (and loading its PLY tables) on first use"""
+    global _cparser
+    if _cparser is None:
+        _cparser = cpp_parser.CPPParser()
+    return _cparser
+
+
+# `cparser` used to be created on import. Keep it available for code that uses it, but only create
+# it when it's actually asked for.
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        if name == 'cparser':
+            return get_cparser()
+        raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+else:
+    cparser = get_cparser()
+
 
 class TokenType(Enum):
     """Enum of token types for C Preprocessor"""
@@ -1270,7 +1290,7 @@ class Generator(object):
         self.ast_hooks = ast_hooks
 
         self.debug_file = debug_file
-        self.parser = cparser
+        self.parser = get_cparser()
         self.tree = self.parser.parse('')
 
     @staticmethod
@@ -1414,8 +1434,9 @@ class Generator(object):
 
         # Convert macros
         macro_src = StringIO()
+        # Store each macro's source, to be evaluated only if it's used (see `nicelib.LibInfo`)
         macro_src.write("# Generated macro definitions\n")
-        macro_src.write("defs = {}\n")
+        macro_src.write("def_srcs = {}\n")
 
         for macro in self.macros:
             py_src = self.gen_py_src(macro)
@@ -1430,10 +1451,8 @@ class Generator(object):
 
                 if isinstance(macro, FuncMacro):
                     arg_list = ', '.join(macro.args)
-                    macro_src.write("defs['{}'] = lambda {}: {}\n".format(macro.name, arg_list,
-                                                                          py_src))
-                else:
-                    macro_src.write("defs['{}'] = {}\n".format(macro.name, py_src))
+                    py_src = 'lambda {}: {}'.format(arg_list, py_src)
+                macro_src.write("def_srcs[{!r}] = {!r}\n".format(macro.name, py_src))
 
         return header_src, macro_src.getvalue(), self.tree, argnames
 
@@ -1537,7 +1556,7 @@ def src_to_c_ast(source):
         raise ConvertError("C-to-Py supports only expressions, not statements")
 
     try:
-        tree = cparser.parse('int main(void){' + source + ';}')
+        tree = get_cparser().parse('int main(void){' + source + ';}')
     except (plyparser.ParseError, AttributeError) as e:
         raise ConvertError(e)
 
@@ -1788,7 +1807,7 @@ def process_source(source, predef_path=None, update_cb=None, ignored_headers=(),
 
         OBJ_MACROS, FUNC_MACROS = get_predef_macros()
         parser = Parser(source, '<root>', REPLACEMENT_MAP, OBJ_MACROS,
-                        FUNC_MACROS, INCLUDE_DIRS, ignored_headers=ignored_headers,
+                        FUNC_MACROS, get_include_dirs(), ignored_headers=ignored_headers,
                         ignore_system_headers=ignore_system_headers)
         parser.parse(update_cb=update_cb)
         tokens = parser.out
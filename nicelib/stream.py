@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""Streaming acquisition of array outputs through a ring of preallocated buffers"""
+from __future__ import division, absolute_import, with_statement, print_function, unicode_literals
+
+import sys
+import threading
+from queue import Queue
+
+from .nicelib import LibFunction, LibMethod, ArrayArgHandler, numpy_dtype
+
+__all__ = ['Stream']
+
+_STOP = object()
+
+
+class Stream(object):
+    """Repeatedly call a function that fills an array, yielding each result in turn
+
+    Each call fills one of a fixed ring of preallocated numpy arrays, so no memory is allocated
+    per call. The calls are made from a background thread, so while you process one result the
+    next call is already underway. If the consumer falls behind, the thread waits for a buffer to
+    be freed up (backpressure) rather than overwriting one that's still in use.
+
+    The function must be a `LibFunction` or `LibMethod` with an ``'arr=in'`` arg. The buffers are
+    passed in place of that arg, and the other args are given via `args`. Plain ``'arr'`` and
+    ``'buf'`` args can't be streamed, since NiceLib allocates those buffers itself on each call;
+    declare the arg as ``'arr=in'`` instead. Each item yielded is whatever the function returns,
+    which includes the filled buffer::
+
+        with Stream(cam.read_frame, 640*480) as stream:
+            for frame in stream:
+                process(frame)
+
+    Parameters
+    ----------
+    func : LibFunction or LibMethod
+        The function to call.
+    length : int
+        Number of elements in each buffer.
+    args : sequence, optional
+        The function's other args, in order, as they'd be passed without the ``'arr=in'`` arg.
+    n_buffers : int, optional
+        Number of buffers in the ring, at least 2. More buffers allow the consumer more slack.
+    count : int, optional
+        Number of calls to make before the stream ends. By default it runs until closed.
+    auto_release : bool, optional
+        If True (the default), each buffer is released for reuse when the next item is requested,
+        so an item is only valid until then. If False, you must pass each buffer to `release()`
+        once you're done with it, and may hold on to up to `n_buffers` of them at once.
+
+    Use the stream as a context manager or call `close()` when you're done with it. A stream that's
+    dropped without being closed stops its thread once it's garbage collected.
+    """
+    def __init__(self, func, length, args=(), n_buffers=3, count=None, auto_release=True):
+        import numpy as np
+        if n_buffers < 2:
+            raise ValueError("A stream needs at least 2 buffers")
+
+        arg_pos, item_ctype, ffi = _find_arr_arg(func)
+        self._auto_release = auto_release
+
+        dtype = numpy_dtype(ffi, item_ctype)
+        self.buffers = [np.zeros(length, dtype=dtype) for _ in range(n_buffers)]
+
+        self._lock = threading.Lock()
+        self._held = None  # Index of the buffer to release on the next item, with auto_release
+        self._out = set()  # Indices of the buffers the consumer has and hasn't released
+        self._done = False
+
+        # The thread mustn't refer to the stream itself, or an abandoned stream would never be
+        # collected (and so never stopped)
+        self._worker = _Worker(func, list(args), arg_pos, self.buffers, count)
+        self._thread = threading.Thread(target=self._worker.run, name='nicelib-stream')
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def n_calls(self):
+        """Number of calls made so far"""
+        return self._worker.n_calls
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._done:
+            raise StopIteration
+        if self._auto_release and self._held is not None:
+            self._release_index(self._held)
+
+        index, result, exc = self._worker.filled.get()
+        if exc is not None:
+            self.close()
+            raise exc
+        if result is _STOP:
+            self._done = True
+            raise StopIteration
+
+        with self._lock:
+            self._out.add(index)
+            self._held = index
+        return result
+
+    next = __next__  # Python 2
+
+    def release(self, buffer):
+        """Release `buffer` for reuse. Only needed if `auto_release` is False."""
+        for index, buf in enumerate(self.buffers):
+            if buf is buffer:
+                self._release_index(index)
+                return
+        raise ValueError("Buffer does not belong to this stream")
+
+    def _release_index(self, index):
+        # Releasing a buffer twice would queue it twice, letting two calls fill it at once
+        with self._lock:
+            if index not in self._out:
+                raise ValueError("Buffer has already been released")
+            self._out.remove(index)
+            if index == self._held:
+                self._held = None
+        self._worker.free.put(index)
+
+    def close(self):
+        """Stop making calls and wait for the background thread to finish"""
+        self._worker.stop()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self._done = True
+
+    def __del__(self):
+        # Don't wait for the thread here, since it may be in the middle of a slow call
+        worker = getattr(self, '_worker', None)
+        if worker is not None:
+            worker.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _Worker(object):
+    """The part of a `Stream` that runs in its background thread"""
+    def __init__(self, func, args, arg_pos, buffers, count):
+        self.func = func
+        self.args = args
+        self.arg_pos = arg_pos
+        self.buffers = buffers
+        self.count = count
+        self.n_calls = 0
+
+        self.free = Queue()
+        for i in range(len(buffers)):
+            self.free.put(i)
+        self.filled = Queue()
+        self.stopping = threading.Event()
+
+    def stop(self):
+        self.stopping.set()
+        self.free.put(_STOP)  # Wake the thread if it's waiting for a free buffer
+
+    def run(self):
+        try:
+            while not self.stopping.is_set():
+                if self.count is not None and self.n_calls >= self.count:
+                    break
+
+                index = self.free.get()
+                if index is _STOP or self.stopping.is_set():
+                    break
+
+                args = list(self.args)
+                args.insert(self.arg_pos, self.buffers[index])
+                result = self.func(*args)
+                self.n_calls += 1
+                self.filled.put((index, result, None))
+        except Exception:
+            self.filled.put((None, None, sys.exc_info()[1]))
+        self.filled.put((None, _STOP, None))
+
+
+def _find_arr_arg(func):
+    """Find the position of `func`'s 'arr=in' arg among its Python args"""
+    if isinstance(func, LibMethod):
+        libfunc = func._libfunc
+        n_skipped = func._niceobj._n_handles if func._use_handle else 0
+    elif isinstance(func, LibFunction):
+        libfunc = func
+        n_skipped = 0
+    else:
+        raise TypeError("Can only stream a LibFunction or LibMethod")
+
+    sig = libfunc.sig
+    for pos, handler in enumerate(sig.in_handlers):
+        if isinstance(handler, ArrayArgHandler):
+            return pos - n_skipped, handler.c_argtype.item, sig.ffi
+    raise ValueError("Function '{}' has no 'arr=in' arg to stream into".format(libfunc.name))
@@ -16,8 +16,10 @@ is_64bit = sys.maxsize > 2**32
 
 if sys.version_info < (3, 3):
     from chainmap import ChainMap
+    from collections import Mapping
 else:
     from collections import ChainMap
+    from collections.abc import Mapping
 
 
 def select_platform_value(platform_dict):
@@ -50,6 +52,44 @@ def suppress(*exceptions):
         pass
 
 
+class LazyDefs(Mapping):
+    """Mapping of macro definitions whose values are evaluated from source on first lookup
+
+    Parameters
+    ----------
+    srcs : dict
+        Maps each name to the Python source of its value.
+    namespace : dict
+        Globals in which the sources are evaluated, e.g. those of the lib module (for ``ffi``).
+    values : dict, optional
+        Already-evaluated definitions, e.g. from a lib module built by an older NiceLib.
+    """
+    def __init__(self, srcs, namespace, values=None):
+        self._srcs = srcs
+        self._namespace = namespace
+        self._values = dict(values or {})
+
+    def __getitem__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            value = self._values[name] = eval(self._srcs[name], self._namespace)
+            return value
+
+    def __contains__(self, name):
+        return name in self._values or name in self._srcs
+
+    def __iter__(self):
+        for name in self._values:
+            yield name
+        for name in self._srcs:
+            if name not in self._values:
+                yield name
+
+    def __len__(self):
+        return len(self._srcs) + sum(1 for name in self._values if name not in self._srcs)
+
+
 def handle_header_path(path, basedir):
     """Find the paths to the specified headers and verify they exist
 
@@ -0,0 +1,68 @@
+"""Measure the startup cost of importing nicelib, with and without the build machinery
+
+Run as::
+
+    python tests/bench_import.py [--repeat N]
+
+Each measurement runs in a fresh interpreter. ``import nicelib`` is what a process that only loads
+prebuilt lib modules pays; ``import nicelib.build`` adds the header-processing machinery (pycparser,
+PLY and its parser tables, cffi's parser), which used to be imported by ``import nicelib`` itself.
+Times are the median over the repeats. Memory is the peak allocated during the import, as measured
+by ``tracemalloc`` in a separate run.
+"""
+from __future__ import print_function
+
+import sys
+import json
+import argparse
+import subprocess
+
+# Time and memory are measured in separate runs, since tracemalloc slows down the import
+TIME_SRC = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'time': elapsed, 'n_modules': len(sys.modules)}}))
+"""
+
+MEMORY_SRC = """
+import json, tracemalloc
+tracemalloc.start()
+import {module}
+print(json.dumps({{'peak_bytes': tracemalloc.get_traced_memory()[1]}}))
+"""
+
+CASES = [
+    ('import nicelib', 'nicelib'),
+    ('import nicelib.build', 'nicelib.build'),
+]
+
+
+def measure(src, module):
+    output = subprocess.check_output([sys.executable, '-c', src.format(module=module)])
+    return json.loads(output.decode())
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=7,
+                        help='number of fresh interpreters per case')
+    args = parser.parse_args(argv)
+
+    measure(TIME_SRC, 'nicelib.build')  # Make sure the PLY tables are already generated
+    for name, module in CASES:
+        runs = [measure(TIME_SRC, module) for _ in range(args.repeat)]
+        peak_bytes = measure(MEMORY_SRC, module)['peak_bytes']
+        print('{:<22} {:>8.1f} ms {:>8.2f} MiB {:>5d} modules'.format(
+            name, median(run['time'] for run in runs) * 1e3, peak_bytes / 2.**20,
+            runs[0]['n_modules']))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,3 +2,8 @@ import os
 import sys
 
 sys.path.append(os.path.join(os.path.dirname(__file__), 'helpers'))
+
+# The aio tests use syntax that doesn't parse on older Pythons
+collect_ignore = []
+if sys.version_info < (3, 7):
+    collect_ignore.append(os.path.join('midlevel', 'test_aio.py'))
@@ -0,0 +1,204 @@
+"""Microbenchmarks of the mid-level call path, using the foo test library
+
+Build the test libs first (``make -C tests sharedlibs``), then run::
+
+    python tests/midlevel/bench_calls.py [--json [PATH]] [--no-threads]
+
+Each case is timed as the best of 5 repeats and reported in ns/call. With ``--json``, the results
+are also written as JSON (to stdout if no PATH is given), so that runs can be compared by script.
+"""
+from __future__ import print_function
+
+import sys
+import json
+import timeit
+import platform
+import argparse
+import threading
+from functools import partial
+
+import cffi
+import nicelib
+from nicelib import NiceLib, NiceObject, Sig, load_lib, ret_return, ret_ignore
+
+
+class NiceFoo(NiceLib):
+    _info = load_lib('foo', pkg=None, dir=__file__)
+    _ret = ret_return
+
+    add = Sig('in', 'in')
+    add_out = Sig('in', 'in', 'out', ret=ret_ignore)
+    increment = Sig('inout', ret=ret_ignore)
+    fill_range = Sig('arr', 'len=in', ret=ret_ignore)
+    fill_points = Sig('arr', 'len=in', ret=ret_ignore)
+    get_name = Sig('buf', 'len', ret=ret_ignore)
+    get_message = Sig('bufout', ret=ret_ignore)
+    get_point = Sig('out', ret=ret_ignore)
+    create_item = Sig()
+    item_get_value = Sig('in')
+
+    @Sig('in', 'in')
+    def subtract(cls, a, b):
+        return cls._autofunc_subtract(a, b)
+
+    class Item(NiceObject):
+        _init_ = 'create_item'
+        _prefix_ = 'item_'
+
+        get_value = Sig('in')
+        get_id = Sig('in')
+
+        @Sig('in', 'in')
+        def set_value(self, value):
+            return self._autofunc_set_value(value)
+
+
+class NiceFooVariants(NiceLib):
+    """Alternative sigs for some of the same C functions"""
+    _info = load_lib('foo', pkg=None, dir=__file__)
+    _ret = ret_return
+
+    add = Sig('in', 'ignore')
+    fill_range = Sig('arr=in', 'len', ret=ret_ignore)
+
+
+class NiceNumpyFoo(NiceLib):
+    _info = load_lib('foo', pkg=None, dir=__file__)
+    _ret = ret_ignore
+    _use_numpy_ = True
+
+    fill_range = Sig('arr', 'len=in')
+    fill_points = Sig('arr', 'len=in')
+
+
+def ns_per_call(func, *args, **kwds):
+    """Best-of-5 time of ``func(*args, **kwds)``, in nanoseconds"""
+    timer = timeit.Timer(partial(func, *args, **kwds))
+    number, _ = timer.autorange() if hasattr(timer, 'autorange') else (100000, None)
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e9
+
+
+def cases():
+    """List of (name, func, args) for each benchmark case"""
+    ffilib = NiceFoo._ffilib
+    item = NiceFoo.Item()
+    handle = item._handles[0]
+    c_int = NiceFoo._ffi.new('int*')
+    out_buf = bytearray(16 * 4)
+
+    result = [
+        # Baselines
+        ('raw cffi add(2, 3)', ffilib.add, (2, 3)),
+        ('raw cffi add_out(2, 3, p)', ffilib.add_out, (2, 3, c_int)),
+        ('raw cffi item_get_value(h)', ffilib.item_get_value, (handle,)),
+
+        # One case per arg handler type
+        ('in: add(2, 3)', NiceFoo.add, (2, 3)),
+        ('ignore: add(2)', NiceFooVariants.add, (2,)),
+        ('out: add_out(2, 3)', NiceFoo.add_out, (2, 3)),
+        ('inout: increment(1)', NiceFoo.increment, (1,)),
+        ('arr+len: fill_range(16)', NiceFoo.fill_range, (16,)),
+        ('arr=in+len: fill_range(buf)', NiceFooVariants.fill_range, (out_buf,)),
+        ('buf+len: get_name()', NiceFoo.get_name, ()),
+        ('bufout: get_message()', NiceFoo.get_message, ()),
+        ('out struct: get_point()', NiceFoo.get_point, ()),
+
+        # Functions vs. methods vs. hybrids
+        ('function: item_get_value(h)', NiceFoo.item_get_value, (handle,)),
+        ('method: item.get_value()', item.get_value, ()),
+        ('method: item.get_id()', item.get_id, ()),
+        ('hybrid function: subtract(3, 2)', NiceFoo.subtract, (3, 2)),
+        ('hybrid method: item.set_value(1.)', item.set_value, (1.,)),
+    ]
+
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        result += [
+            ('numpy arr+len: fill_range(16)', NiceNumpyFoo.fill_range, (16,)),
+            ('numpy struct arr: fill_points(16)', NiceNumpyFoo.fill_points, (16,)),
+        ]
+    return result
+
+
+def run():
+    """Time each benchmark case, returning a list of (name, ns/call) pairs"""
+    results = [(name, ns_per_call(func, *args)) for name, func, args in cases()]
+    results += [
+        ('in, kwarg: add(2, b=3)', ns_per_call(NiceFoo.add, 2, b=3)),
+        ('in, kwargs: add(a=2, b=3)', ns_per_call(NiceFoo.add, a=2, b=3)),
+    ]
+    return results
+
+
+def calls_per_sec(func, args, n_threads, calls_per_thread):
+    """Throughput of `n_threads` threads each calling ``func(*args)`` `calls_per_thread` times"""
+    def worker():
+        for _ in range(calls_per_thread):
+            func(*args)
+
+    threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+    start = timeit.default_timer()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return n_threads * calls_per_thread / (timeit.default_timer() - start)
+
+
+def run_thread_scaling(thread_counts=(1, 2, 4, 8), length=200000, calls_per_thread=200):
+    """Scaling of concurrent calls to the same function, whose C call releases the GIL"""
+    return [(n, calls_per_sec(NiceFoo.fill_range, (length,), n, calls_per_thread))
+            for n in thread_counts]
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'nicelib': nicelib.__version__,
+        'cffi': cffi.__version__,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--json', nargs='?', const='-', metavar='PATH',
+                        help='write results as JSON to PATH, or stdout if no PATH is given')
+    parser.add_argument('--no-threads', action='store_true', help='skip the thread scaling test')
+    args = parser.parse_args(argv)
+    to_stdout = args.json == '-'
+    log = partial(print, file=sys.stderr if to_stdout else sys.stdout)
+
+    results = run()
+    for name, ns in results:
+        log('{:<36} {:>9.0f} ns/call'.format(name, ns))
+
+    scaling = []
+    if not args.no_threads:
+        log('\nfill_range(200000) throughput:')
+        scaling = run_thread_scaling()
+        for n_threads, rate in scaling:
+            log('{:>2} threads {:>9.0f} calls/s ({:.2f}x)'.format(n_threads, rate,
+                                                                scaling[0][1] and
+                                                                rate / scaling[0][1]))
+
+    if args.json:
+        data = {
+            'environment': environment(),
+            'ns_per_call': dict(results),
+            'thread_scaling': {str(n): rate for n, rate in scaling},
+        }
+        if to_stdout:
+            json.dump(data, sys.stdout, indent=2, sort_keys=True)
+            print()
+        else:
+            with open(args.json, 'w') as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
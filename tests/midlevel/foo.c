@@ -1,10 +1,23 @@
 #include <stdlib.h>
+#include <string.h>
 
 typedef struct {
     int id;
     float value;
 } Item;
 
+typedef struct {
+    int id;
+    double value;
+    char tag;
+    short coords[3];
+} Point;
+
+typedef struct {
+    unsigned int enabled : 1;
+    unsigned int level : 7;
+} Flags;
+
 int add(int a, int b) {
     return a + b;
 }
@@ -37,3 +50,62 @@ void item_set_value(Item *pitem, float value) {
 int item_static_value(void) {
     return 5;
 }
+
+void add_out(int a, int b, int *result) {
+    *result = a + b;
+}
+
+void fill_range(int *arr, int len) {
+    int i;
+    for (i = 0; i < len; i++) {
+        arr[i] = i;
+    }
+}
+
+void get_name(char *buf, int len) {
+    strncpy(buf, "foo", len);
+}
+
+void maybe_get_name(int write, char *buf, int len) {
+    if (write) {
+        strncpy(buf, "foo", len);
+    }
+}
+
+int sum_array(int *arr, int len) {
+    int i, sum = 0;
+    for (i = 0; i < len; i++) {
+        sum += arr[i];
+    }
+    return sum;
+}
+
+void fill_points(Point *points, int len) {
+    int i;
+    for (i = 0; i < len; i++) {
+        points[i].id = i;
+        points[i].value = i * 0.5;
+        points[i].tag = 'a' + i;
+        points[i].coords[0] = i;
+        points[i].coords[1] = 2*i;
+        points[i].coords[2] = 3*i;
+    }
+}
+
+void get_point(Point *point) {
+    fill_points(point, 1);
+    point->id = 7;
+}
+
+void get_flags(Flags *flags) {
+    flags->enabled = 1;
+    flags->level = 5;
+}
+
+void increment(int *value) {
+    (*value)++;
+}
+
+void get_message(char **message) {
+    *message = "hello";
+}
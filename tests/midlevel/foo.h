@@ -7,3 +7,30 @@ extern int item_get_id(Item*);
 extern float item_get_value(Item*);
 extern void item_set_value(Item*, float);
 extern int item_static_value(void);
+extern void add_out(int a, int b, int *result);
+extern void fill_range(int *arr, int len);
+extern void get_name(char *buf, int len);
+extern void maybe_get_name(int write, char *buf, int len);
+extern int sum_array(int *arr, int len);
+
+typedef struct {
+    int id;
+    double value;
+    char tag;
+    short coords[3];
+} Point;
+
+extern void fill_points(Point *points, int len);
+extern void get_point(Point *point);
+extern void increment(int *value);
+extern void get_message(char **message);
+
+typedef struct {
+    unsigned int enabled : 1;
+    unsigned int level : 7;
+} Flags;
+
+extern void get_flags(Flags *flags);
+
+#define FOO_MAX_ITEMS 16
+#define FOO_DOUBLE(x) ((x) * 2)
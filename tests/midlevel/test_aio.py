@@ -0,0 +1,83 @@
+import gc
+import time
+import weakref
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from nicelib import NiceLib, load_lib, Sig, NiceObject
+
+
+class NiceFoo(NiceLib):
+    _info = load_lib('foo', pkg=None, dir=__file__)
+    _aio_executor_ = ThreadPoolExecutor(4)
+    _aio_limit_ = 2
+
+    add = Sig('in', 'in')
+    create_item = Sig()
+
+    class Item(NiceObject):
+        _init_ = 'create_item'
+        _prefix_ = 'item_'
+        _aio_limit_ = 1
+
+        get_value = Sig('in')
+        set_value = Sig('in', 'in')
+
+        def slow_set_value(self, value):
+            with self._lock:
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+            time.sleep(0.05)
+            self.set_value(value)
+            with self._lock:
+                self.active -= 1
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_aio_lib():
+    assert run(NiceFoo.aio.add(1, 2)) == 3
+    async def add_all():
+        return await asyncio.gather(*[NiceFoo.aio.add(i, i) for i in range(10)])
+    results = run(add_all())
+    assert results == list(range(0, 20, 2))
+    assert NiceFoo.aio.add is NiceFoo.aio.add
+    assert 'add' in dir(NiceFoo.aio)
+
+
+def test_aio_object():
+    item = NiceFoo.Item()
+    run(item.aio.set_value(5))
+    assert run(item.aio.get_value()) == 5
+    assert item.aio is item.aio
+    assert len(item.aio._limiters) == 2
+
+
+def test_aio_object_not_cyclic():
+    item = NiceFoo.Item()
+    run(item.aio.set_value(5))
+    ref = weakref.ref(item)
+    gc.disable()
+    try:
+        del item
+        assert ref() is None
+    finally:
+        gc.enable()
+
+
+def test_aio_limit_held_during_cancelled_call():
+    item = NiceFoo.Item()
+    item._lock = threading.Lock()
+    item.active = item.peak = 0
+
+    async def cancel_then_call():
+        task = asyncio.ensure_future(item.aio.slow_set_value(1))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await item.aio.slow_set_value(2)
+
+    run(cancel_then_call())
+    assert item.peak == 1
+    assert item.get_value() == 2
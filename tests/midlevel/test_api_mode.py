@@ -0,0 +1,66 @@
+import os
+import sys
+import shutil
+import threading
+import pytest
+from nicelib import NiceLib, NiceObject, Sig, build_lib, load_lib, ret_ignore
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(scope='module')
+def api_dir(tmpdir_factory):
+    return str(tmpdir_factory.mktemp('api'))
+
+
+@pytest.fixture(scope='module')
+def api_info(api_dir):
+    if not sys.platform.startswith('linux'):
+        pytest.skip('Test lib is only built on linux')
+    libdir = api_dir
+    for fname in ('foo.h', 'libfoo.so'):
+        shutil.copy(os.path.join(HERE, fname), libdir)
+
+    build_lib({'linux*': {'header': 'foo.h'}}, 'libfoo.so', '_fooapilib', libdir, api_mode=True)
+    return load_lib('fooapi', dir=os.path.join(libdir, 'dummy'))
+
+
+def test_api_mode(api_info, api_dir):
+    if not api_info._api_mode:
+        pytest.skip('No C compiler available')
+
+    class NiceFoo(NiceLib):
+        _info_ = api_info
+
+        add = Sig('in', 'in')
+        fill_range = Sig('arr', 'len=in', ret=ret_ignore)
+        create_item = Sig()
+
+        class Item(NiceObject):
+            _init_ = 'create_item'
+            _prefix_ = 'item_'
+
+            get_value = Sig('in')
+            set_value = Sig('in', 'in')
+
+    assert NiceFoo.add(2, 3) == 5
+    assert not [fname for fname in os.listdir(api_dir) if fname.endswith(('.c', '.o'))]
+    assert list(NiceFoo.fill_range(3)) == [0, 1, 2]
+    item = NiceFoo.Item()
+    item.set_value(1.5)
+    assert item.get_value() == 1.5
+    assert api_info._argnames['add'] == ['a', 'b']
+
+
+def test_api_mode_override():
+    from nicelib import build
+    seen = []
+    with build.api_mode_override(True):
+        assert build._api_mode_override.value is True
+        thread = threading.Thread(
+            target=lambda: seen.append(getattr(build._api_mode_override, 'value', None)))
+        thread.start()
+        thread.join()
+    assert seen == [None]  # Other threads keep the default
+    assert build._api_mode_override.value is None
+    assert build.DEFAULT_API_MODE is False
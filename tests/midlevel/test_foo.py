@@ -1,5 +1,7 @@
 import sys
-from nicelib import NiceLib, load_lib, Sig, NiceObject, ret_ignore, ret_return
+import pytest
+from nicelib import NiceLib, load_lib, Sig, NiceObject, RetHandler, ret_ignore, ret_return
+from nicelib.nicelib import LibFunction
 
 
 class NiceFoo(NiceLib):
@@ -10,6 +12,7 @@ class NiceFoo(NiceLib):
     add = Sig('in', 'in')
     subtract = Sig('in', 'in')
     create_item = Sig()
+    sum_array = Sig('in', 'in')
 
     class Item(NiceObject):
         _init_ = 'create_item'
@@ -25,14 +28,470 @@ def test_add():
     assert NiceFoo.add(2, 2) == 4
 
 
+def test_inarg_conversion():
+    assert NiceFoo.add(2**32 + 2, 3) == 5  # Out-of-range ints are still cast
+    assert NiceFoo.sum_array(5, 1) == 5  # Pointer to a new int
+    with pytest.raises(TypeError):
+        NiceFoo.sum_array([1, 2, 3], 3)
+    with pytest.raises(TypeError):
+        NiceFoo.add('ab', 2)
+
+
+def test_numpy_inarg():
+    np = pytest.importorskip('numpy')
+    assert NiceFoo.sum_array(np.arange(4, dtype='i4'), 4) == 6
+    with pytest.raises(TypeError):
+        NiceFoo.sum_array(np.arange(4, dtype='f8'), 4)
+
+
 def test_static_method():
     item = NiceFoo.Item()
     assert item.static_value() == 5
 
 
+def test_bound_method():
+    import gc
+    import weakref
+    item1, item2 = NiceFoo.Item(), NiceFoo.Item()
+    assert item1.get_id() != item2.get_id()
+    assert item1.get_id.__doc__.startswith('get_id() -> ')
+
+    # Using a method doesn't make the object part of a reference cycle
+    ref = weakref.ref(item1)
+    gc.disable()
+    try:
+        del item1
+        assert ref() is None
+    finally:
+        gc.enable()
+
+
 def test_kwargs():
     if sys.version_info < (3,3):
         return
     assert NiceFoo.subtract(7, b=5) == 2
     assert NiceFoo.subtract(a=7, b=5) == 2
     assert NiceFoo.subtract(b=5, a=7) == 2
+
+    with pytest.raises(TypeError):
+        NiceFoo.subtract(7, a=5)
+    with pytest.raises(TypeError):
+        NiceFoo.subtract(7, c=5)
+
+
+def test_wrong_num_args():
+    with pytest.raises(TypeError):
+        NiceFoo.add(1)
+    with pytest.raises(TypeError):
+        NiceFoo.add(1, 2, 3)
+    with pytest.raises(TypeError):
+        NiceFoo.Item().get_id(1)
+
+
+def test_tracer():
+    traces = []
+    NiceFoo._set_tracer(traces.append)
+    try:
+        NiceFoo.add(2, 3)
+        NiceFoo.Item().set_value(1.5)
+    finally:
+        NiceFoo._set_tracer(None)
+    NiceFoo.add(2, 3)
+
+    assert [t.name for t in traces] == ['add', 'create_item', 'set_value']
+    assert traces[0].args == (2, 3)
+    assert traces[0].retval == 5
+    assert traces[0].duration >= 0
+
+
+def test_stats():
+    NiceRetFoo._enable_stats()
+    try:
+        for i in range(3):
+            NiceRetFoo.add(i, 1)
+        NiceRetFoo.add_out(1, 2)
+        NiceRetFoo.Item().get_value()
+        with pytest.raises(KeyError):
+            NiceRetFoo.sum_array(1, 1)
+        with pytest.raises(TypeError):
+            NiceRetFoo.add(None, 1)
+
+        stats = NiceRetFoo._stats(reset=True)
+        assert set(stats) == {'add', 'add_out', 'create_item', 'Item.get_value', 'sum_array'}
+        assert stats['add']['calls'] == 3
+        assert stats['add']['errors'] == 0
+        assert stats['sum_array']['calls'] == 1
+        assert sum(count for _, count in stats['sum_array']['hist']) == 1
+        assert sum(count for _, count in stats['add']['hist']) == 3
+        assert stats['add_out']['out_bytes'] == NiceRetFoo._ffi.sizeof('int')
+        assert stats['sum_array']['errors'] == 1
+        assert NiceRetFoo._stats() == {}
+    finally:
+        NiceRetFoo._enable_stats(False)
+    NiceRetFoo.add(1, 2)
+    assert NiceRetFoo._stats() == {}
+
+
+def test_profiling():
+    NiceOutArrFoo._enable_profiling()
+    try:
+        NiceOutArrFoo.fill_range(bytearray(8))
+        profile = NiceOutArrFoo._profile()
+        assert profile['fill_range']['calls'] == 1
+        assert list(profile['fill_range']['phases']) == ['bind', 'arg arr', 'arg len', 'C call',
+                                                         'outputs', 'ret']
+        assert 'fill_range (1)' in NiceOutArrFoo._profile(table=True, reset=True)
+        assert NiceOutArrFoo._profile() == {}
+    finally:
+        NiceOutArrFoo._enable_profiling(False)
+
+
+def test_profiling_plain_inputs():
+    NiceFoo._enable_profiling()
+    try:
+        assert NiceFoo.add(2, 3) == 5
+        profile = NiceFoo._profile(reset=True)
+        assert list(profile['add']['phases']) == ['bind', 'arg a', 'arg b', 'C call', 'ret']
+    finally:
+        NiceFoo._enable_profiling(False)
+
+
+class NicePooledFoo(NiceLib):
+    _info = load_lib('foo', pkg=None, dir=__file__)
+    _ret = ret_ignore
+    _buf_pool_ = True
+
+    add_out = Sig('in', 'in', 'out')
+    fill_range = Sig('arr', 'len=in')
+    get_name = Sig('buf', 'len')
+    maybe_get_name = Sig('in', 'buf', 'len')
+
+
+def test_buf_pool():
+    assert NicePooledFoo.add_out(2, 3) == 5
+    assert NicePooledFoo.add_out(4, 3) == 7
+    assert NicePooledFoo.get_name() == b'foo'
+    assert NicePooledFoo.get_name() == b'foo'
+
+    arr1 = NicePooledFoo.fill_range(5)
+    arr2 = NicePooledFoo.fill_range(5)
+    assert list(arr2) == [0, 1, 2, 3, 4]
+    assert arr1 == arr2  # Aliases the pooled buffer
+    assert len(NicePooledFoo.fill_range(3)) == 3
+
+
+def test_buf_pool_cleared():
+    assert NicePooledFoo.maybe_get_name(1) == b'foo'
+    assert NicePooledFoo.maybe_get_name(0) == b''  # Not the previous call's contents
+
+
+class NiceCopyPooledFoo(NiceLib):
+    _info = load_lib('foo', pkg=None, dir=__file__)
+    _buf_pool_ = 'copy'
+
+    fill_range = Sig('arr', 'len=in', ret=ret_ignore)
+
+
+def test_buf_pool_copy():
+    arr1 = NiceCopyPooledFoo.fill_range(5)
+    arr2 = NiceCopyPooledFoo.fill_range(5)
+    assert list(arr1) == list(arr2) == [0, 1, 2, 3, 4]
+    assert arr1 != arr2
+
+
+class NiceOutArrFoo(NiceLib):
+    _info = load_lib('foo', pkg=None, dir=__file__)
+    _ret = ret_ignore
+
+    fill_range = Sig('arr=in', 'len')
+
+
+def test_caller_array():
+    buf = bytearray(12)
+    assert NiceOutArrFoo.fill_range(buf) is buf
+    assert NiceOutArrFoo._ffi.cast('int*', NiceOutArrFoo._ffi.from_buffer(buf))[2] == 2
+
+    with pytest.raises(TypeError):
+        NiceOutArrFoo.fill_range(bytearray(5))  # Not a whole number of ints
+    with pytest.raises(TypeError):
+        NiceOutArrFoo.fill_range(b'\0' * 12)  # Read-only
+
+
+def test_caller_numpy_array():
+    np = pytest.importorskip('numpy')
+    arr = np.zeros(5, dtype='i4')
+    assert NiceOutArrFoo.fill_range(arr) is arr
+    assert list(arr) == [0, 1, 2, 3, 4]
+
+    with pytest.raises(TypeError):
+        NiceOutArrFoo.fill_range(np.zeros(5, dtype='f8'))
+    with pytest.raises(TypeError):
+        NiceOutArrFoo.fill_range(np.zeros(10, dtype='i4')[::2])
+
+
+def test_call_many():
+    assert NiceFoo.add.call_many([(1, 2), (3, 4)]) == [3, 7]
+    assert NiceFoo.add.call_many((i, i) for i in range(20)) == list(range(0, 40, 2))
+
+    item = NiceFoo.Item()
+    item.set_value.call_many([1, 2, 3])
+    assert item.get_value() == 3
+    assert item.get_value.call_many([()] * 2) == [3, 3]
+
+    with pytest.raises(TypeError):
+        NiceFoo.add.call_many([(1, 2, 3)])
+    with pytest.raises(TypeError):
+        NiceFoo.add.call_many([(1, None)])
+
+
+def test_call_many_threaded():
+    pytest.importorskip('concurrent.futures')
+    assert NiceFoo.add.call_many([(1, 2), (3, 4)], max_workers=2) == [3, 7]
+    assert NiceFoo.add.call_many([(i, i) for i in range(9)], max_workers=4) == list(range(0, 18, 2))
+    assert NiceFoo.add.call_many([], max_workers=2) == []
+
+
+def test_call_many_stack():
+    np = pytest.importorskip('numpy')
+    result = NicePooledFoo.add_out.call_many([(1, 2), (3, 4)], stack=True)
+    assert isinstance(result, np.ndarray)
+    assert list(result) == [3, 7]
+
+
+@RetHandler(num_retvals=1)
+def ret_context(retval, funcname, niceobj):
+    return (retval, funcname, niceobj)
+
+
+@RetHandler(num_retvals=0)
+def ret_bad_arg(retval, nonexistent):
+    pass
+
+
+class NiceRetFoo(NiceLib):
+    _info = load_lib('foo', pkg=None, dir=__file__)
+
+    add = Sig('in', 'in', ret=ret_context)
+    subtract = Sig('in', 'in', ret=ret_ignore)
+    sum_array = Sig('in', 'in', ret=ret_bad_arg)
+    add_out = Sig('in', 'in', 'out', ret=ret_ignore)
+    create_item = Sig(ret=ret_return)
+
+    class Item(NiceObject):
+        _init_ = 'create_item'
+        _prefix_ = 'item_'
+        _ret_ = ret_context
+
+        get_value = Sig('in')
+
+
+def test_ret_handler_args():
+    assert NiceRetFoo.add(1, 2) == (3, 'add', None)
+    assert NiceRetFoo.add_out(1, 2) == 3
+    assert NiceRetFoo.subtract(3, 2) is None
+
+    with pytest.raises(KeyError):
+        NiceRetFoo.sum_array(1, 1)
+
+
+freed_bufs = []
+
+
+@RetHandler(num_retvals=0)
+def ret_raise(retval):
+    raise RuntimeError('error from ret handler')
+
+
+class NiceFreeBufFoo(NiceLib):
+    _info = load_lib('foo', pkg=None, dir=__file__)
+    _free_buf = freed_bufs.append
+
+    get_message = Sig('bufout', ret=ret_raise)
+
+
+def test_ret_handler_raises_after_free_buf():
+    del freed_bufs[:]
+    with pytest.raises(RuntimeError):
+        NiceFreeBufFoo.get_message()
+    assert len(freed_bufs) == 1
+
+
+def test_ret_handler_niceobj():
+    item = NiceRetFoo.Item()
+    value, funcname, niceobj = item.get_value()
+    assert funcname == 'get_value'
+    assert niceobj is item
+
+
+class NiceNumpyFoo(NiceLib):
+    _info = load_lib('foo', pkg=None, dir=__file__)
+    _ret = ret_ignore
+    _use_numpy_ = True
+
+    fill_points = Sig('arr', 'len=in')
+    get_point = Sig('out')
+    get_flags = Sig('out')
+
+
+def test_struct_array_numpy():
+    pytest.importorskip('numpy')
+    points = NiceNumpyFoo.fill_points(4)
+    assert points.dtype.itemsize == NiceNumpyFoo._ffi.sizeof('Point')
+    assert list(points['id']) == [0, 1, 2, 3]
+    assert list(points['value']) == [0., 0.5, 1., 1.5]
+    assert list(points['coords'][3]) == [3, 6, 9]
+    assert points['tag'][1] == ord('b')
+
+
+def test_struct_out_numpy():
+    pytest.importorskip('numpy')
+    point = NiceNumpyFoo.get_point()
+    assert point['id'] == 7
+    assert point['value'] == 0.
+
+
+def test_bitfield_struct_out_numpy():
+    pytest.importorskip('numpy')
+    # Bitfields have no numpy equivalent, so the struct comes back as cdata
+    flags = NiceNumpyFoo.get_flags()
+    assert flags.enabled == 1
+    assert flags.level == 5
+
+
+def test_numpy_dtype():
+    np = pytest.importorskip('numpy')
+    from nicelib.nicelib import numpy_dtype
+    ffi = NiceFoo._ffi
+    expected = {
+        '_Bool': np.bool_,
+        'char': np.int8,
+        'uint8_t': np.uint8,
+        'int64_t': np.int64,
+        'size_t': np.uintp,
+        'intptr_t': np.intp,
+        'float': np.float32,
+        'long double': np.longdouble,
+        'void *': np.uintp,
+    }
+    for cname, dtype in expected.items():
+        assert numpy_dtype(ffi, ffi.typeof(cname)) == np.dtype(dtype)
+    assert numpy_dtype(ffi, ffi.typeof('int[3]')) == np.dtype(('i4', 3))
+    assert numpy_dtype(ffi, ffi.typeof('Point')) is numpy_dtype(ffi, ffi.typeof('Point'))
+
+
+class NiceSlottedFoo(NiceLib):
+    _info = load_lib('foo', pkg=None, dir=__file__)
+    _ret = ret_return
+
+    create_item = Sig()
+
+    class Item(NiceObject):
+        _init_ = 'create_item'
+        _prefix_ = 'item_'
+        _slots_ = True
+
+        get_id = Sig('in')
+        set_value = Sig('in', 'in', ret=ret_ignore)
+        get_value = Sig('in')
+
+
+def test_slotted_niceobject():
+    item = NiceSlottedFoo.Item()
+    assert not hasattr(item, '__dict__')
+    item.set_value(2.5)
+    assert item.get_value() == 2.5
+
+    with pytest.raises(AttributeError):
+        item.other = 1
+
+
+def test_from_handles():
+    handles = [NiceSlottedFoo.create_item() for _ in range(3)]
+    items = NiceSlottedFoo.Item._from_handles(handles)
+    assert [item._handles for item in items] == [(h,) for h in handles]
+    assert items[1].get_id() == NiceSlottedFoo._ffilib.item_get_id(handles[1])
+
+    items = NiceFoo.Item._from_handles(NiceFoo._ffi.new('Item*[]', handles))
+    assert items[2].get_id() == NiceFoo._ffilib.item_get_id(handles[2])
+
+
+class NiceLazyFoo(NiceLib):
+    _info = load_lib('foo', pkg=None, dir=__file__)
+    _ret = ret_return
+    _lazy_ = True
+
+    add = Sig('in', 'in')
+    create_item = Sig()
+    missing_func = Sig('in')
+
+    @Sig('in', 'in')
+    def subtract(cls, a, b):
+        return cls._autofunc_subtract(a, b)
+
+    class Item(NiceObject):
+        _init_ = 'create_item'
+        _prefix_ = 'item_'
+
+        get_id = Sig('in')
+
+        @Sig('in', 'in', ret=ret_ignore)
+        def set_value(self, value):
+            self._autofunc_set_value(value)
+
+        get_value = Sig('in')
+
+
+def test_lazy():
+    assert 'add' not in NiceLazyFoo._libfuncs
+    assert NiceLazyFoo.add(2, 3) == 5
+    assert NiceLazyFoo._libfuncs['add'] is NiceLazyFoo.__dict__['add']
+    assert NiceLazyFoo.subtract(7, 5) == 2
+
+    item = NiceLazyFoo.Item()
+    item.set_value(1.5)
+    assert item.get_value() == 1.5
+    item.get_id()
+    assert isinstance(NiceLazyFoo.Item.__dict__['get_id'], LibFunction)
+
+    with pytest.raises(AttributeError):
+        NiceLazyFoo.missing_func
+
+    if sys.version_info >= (3,3):
+        from inspect import signature
+        assert list(signature(NiceLazyFoo.add).parameters) == ['a', 'b']
+        # The class itself is still introspectable
+        assert list(signature(LibFunction).parameters) == ['name', 'c_name', 'sig', 'c_func']
+    assert LibFunction.__doc__.startswith('A function of a NiceLib')
+
+
+def test_prewarm():
+    NiceLazyFoo._prewarm()
+    assert set(name for name, _ in NiceLazyFoo._iter_libfuncs()) == {
+        'add', 'create_item', 'subtract', 'Item.get_id', 'Item.set_value', 'Item.get_value'}
+    assert NiceLazyFoo.add.__doc__.startswith('add(a, b)')
+
+
+def test_symbol_index():
+    assert NiceLazyFoo._info is NiceFoo._info
+    assert NiceLazyFoo._symbols is NiceFoo._symbols
+    symbols = NiceFoo._symbols
+    assert symbols.is_function('add')
+    assert not symbols.is_function('Point')
+    assert 'add' not in symbols.values
+
+    # Precomputed by build_lib(), which relies on cffi internals
+    kinds = NiceFoo._info._symbol_kinds
+    assert kinds is not None
+    assert kinds['add'] == 'function'
+    assert 'Point' not in kinds
+
+
+def test_macro_defs():
+    defs = NiceFoo._info._defs
+    assert 'FOO_MAX_ITEMS' in defs
+    assert NiceFoo._info.FOO_MAX_ITEMS == 16
+    assert NiceFoo.FOO_DOUBLE(3) == 6
+    assert 'FOO_DOUBLE' in NiceFoo.__dict__  # Cached once looked up
+    assert 'FOO_MAX_ITEMS' in dir(NiceLazyFoo)
+    with pytest.raises(AttributeError):
+        NiceFoo.FOO_MISSING
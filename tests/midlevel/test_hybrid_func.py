@@ -21,5 +21,29 @@ class NiceFoo(NiceLib):
         set_value = Sig('in', 'in')
 
 
+class NiceHybridMethodFoo(NiceLib):
+    _info = load_lib('foo', pkg=None, dir=__file__)
+    _ret = ret_return
+
+    create_item = Sig()
+
+    class Item(NiceObject):
+        _init_ = 'create_item'
+        _prefix_ = 'item_'
+
+        get_value = Sig('in')
+
+        @Sig('in', 'in')
+        def set_value(self, value):
+            return self._autofunc_set_value(value * 2)
+
+
 def test_add():
     assert NiceFoo.add(2, 2) == 4
+
+
+def test_hybrid_method():
+    item = NiceHybridMethodFoo.Item()
+    item.set_value(1.5)
+    item.set_value(2.0)  # The autofunc must not shadow the hybrid method
+    assert item.get_value() == 4.0
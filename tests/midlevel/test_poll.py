@@ -0,0 +1,92 @@
+import time
+import threading
+import pytest
+from nicelib import NiceLib, NiceObject, load_lib, Sig, ret_return
+from nicelib.poll import Poller, Sample
+
+
+class NiceFoo(NiceLib):
+    _info = load_lib('foo', pkg=None, dir=__file__)
+    _ret = ret_return
+
+    add = Sig('in', 'in')
+    create_item = Sig()
+
+    class Item(NiceObject):
+        _init_ = 'create_item'
+        _prefix_ = 'item_'
+
+        get_value = Sig('in')
+        set_value = Sig('in', 'in')
+
+
+def test_poller_latest():
+    item = NiceFoo.Item()
+    item.set_value(2.5)
+    with Poller(item.get_value, period=0.005) as poller:
+        assert poller.wait_next(timeout=1).value == 2.5
+        item.set_value(3.5)
+        poller.wait_next(timeout=1)
+        assert poller.latest().value == 3.5
+    assert poller.stats()['calls'] >= 2
+
+
+def test_poller_subscriptions():
+    with Poller(NiceFoo.add, period=0.002, args=(1, 2)) as poller:
+        every = poller.subscribe()
+        newest = poller.subscribe(maxsize=2, drop='oldest')
+        time.sleep(0.05)
+    samples = every.get_all()
+    assert len(samples) >= 3
+    assert all(s.value == 3 for s in samples)
+    assert [s.time for s in samples] == sorted(s.time for s in samples)
+    assert len(newest) == 2
+    assert newest.get().time == samples[-2].time
+
+    stats = poller.stats()
+    assert stats['rate'] > 0
+    assert stats['jitter_max'] >= stats['jitter_rms'] >= 0
+
+
+def test_poller_errors():
+    with Poller(NiceFoo.add, period=0.002, args=(1,)) as poller:
+        time.sleep(0.02)
+    assert poller.latest() is None
+    assert isinstance(poller.last_error, TypeError)
+    assert poller.stats()['errors'] == poller.stats()['calls'] > 0
+
+
+def test_subscription_timeout():
+    poller = Poller(NiceFoo.add, period=1, args=(1, 2), start=False)
+    with pytest.raises(IOError):
+        poller.subscribe().get(timeout=0.01)
+    with pytest.raises(ValueError):
+        poller.subscribe(drop='bogus')
+
+
+def notify_then_publish(poller, cond):
+    """From another thread, wake waiters on `cond` without a sample, then publish one"""
+    def run():
+        time.sleep(0.02)
+        with cond:
+            cond.notify_all()
+        time.sleep(0.05)
+        poller._publish(Sample(time.time(), 42))
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_subscription_spurious_wakeup():
+    poller = Poller(NiceFoo.add, period=1, args=(1, 2), start=False)
+    sub = poller.subscribe()
+    thread = notify_then_publish(poller, sub._cond)
+    assert sub.get(timeout=5).value == 42
+    thread.join()
+
+
+def test_wait_next_spurious_wakeup():
+    poller = Poller(NiceFoo.add, period=1, args=(1, 2), start=False)
+    thread = notify_then_publish(poller, poller._latest_cond)
+    assert poller.wait_next(timeout=5).value == 42
+    thread.join()
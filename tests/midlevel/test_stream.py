@@ -0,0 +1,77 @@
+import gc
+import pytest
+from nicelib import NiceLib, load_lib, Sig, ret_ignore
+from nicelib.stream import Stream
+
+np = pytest.importorskip('numpy')
+
+
+class NiceFoo(NiceLib):
+    _info = load_lib('foo', pkg=None, dir=__file__)
+    _ret = ret_ignore
+
+    fill_range = Sig('arr=in', 'len')
+    fill_points = Sig('arr=in', 'len=in')
+    add = Sig('in', 'in')
+
+
+def test_stream():
+    with Stream(NiceFoo.fill_range, 8, count=10) as stream:
+        frames = [frame.copy() for frame in stream]
+    assert len(frames) == 10
+    assert all(list(frame) == list(range(8)) for frame in frames)
+    assert stream.n_calls == 10
+
+
+def test_stream_reuses_buffers():
+    with Stream(NiceFoo.fill_range, 4, n_buffers=2, count=6) as stream:
+        ids = {id(frame) for frame in stream}
+    assert ids <= {id(buf) for buf in stream.buffers}
+
+
+def test_stream_other_args():
+    with Stream(NiceFoo.fill_points, 4, args=(3,), count=2) as stream:
+        for points in stream:
+            assert list(points['id']) == [0, 1, 2, 0]
+
+
+def test_stream_explicit_release():
+    stream = Stream(NiceFoo.fill_range, 4, n_buffers=2, auto_release=False)
+    try:
+        first, second = next(stream), next(stream)
+        assert first is not second
+        stream.release(first)
+        assert next(stream) is first
+        with pytest.raises(ValueError):
+            stream.release(np.zeros(4))
+        stream.release(second)
+        with pytest.raises(ValueError):
+            stream.release(second)
+    finally:
+        stream.close()
+
+
+def test_stream_release_held_buffer():
+    with Stream(NiceFoo.fill_range, 4, n_buffers=2, count=4) as stream:
+        first = next(stream)
+        stream.release(first)
+        with pytest.raises(ValueError):
+            stream.release(first)
+        frames = [next(stream) for _ in range(3)]
+    # Each buffer was only queued once, so consecutive frames never share one
+    assert frames[0] is not frames[1] and frames[1] is not frames[2]
+
+
+def test_stream_abandoned():
+    stream = Stream(NiceFoo.fill_range, 4, n_buffers=2)
+    next(stream)
+    thread = stream._thread
+    del stream
+    gc.collect()
+    thread.join(5)
+    assert not thread.is_alive()
+
+
+def test_stream_needs_arr_in():
+    with pytest.raises(ValueError):
+        Stream(NiceFoo.add, 4)
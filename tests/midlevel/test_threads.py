@@ -0,0 +1,35 @@
+import sys
+import threading
+from nicelib import NiceLib, load_lib, Sig, ret_ignore
+
+
+class NiceFoo(NiceLib):
+    _info = load_lib('foo', pkg=None, dir=__file__)
+    _ret = ret_ignore
+
+    fill_range = Sig('arr', 'len=in')
+
+
+def test_concurrent_array_lengths():
+    errors = []
+
+    def worker(length):
+        for _ in range(2000):
+            arr = NiceFoo.fill_range(length)
+            if len(arr) != length or arr[length-1] != length-1:
+                errors.append((length, len(arr)))
+
+    threads = [threading.Thread(target=worker, args=(length,)) for length in range(1, 17)]
+    if hasattr(sys, 'setswitchinterval'):
+        old_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)  # Switch threads as often as possible to provoke races
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        if hasattr(sys, 'setswitchinterval'):
+            sys.setswitchinterval(old_interval)
+
+    assert not errors
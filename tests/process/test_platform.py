@@ -0,0 +1,54 @@
+import os
+from nicelib import platform
+
+
+def use_templates(tmpdir, monkeypatch):
+    monkeypatch.setattr(platform, 'INCLUDE_DIR_TEMPLATES',
+                        [os.path.join(str(tmpdir), '*', 'include')])
+    monkeypatch.setattr(platform, '_include_dirs', None)
+
+
+def test_include_dirs_memoized(tmpdir, monkeypatch):
+    tmpdir.mkdir('a').mkdir('include')
+    tmpdir.mkdir('b')
+    use_templates(tmpdir, monkeypatch)
+
+    dirs = platform.get_include_dirs()
+    assert dirs == [str(tmpdir.join('a', 'include'))]
+    assert platform.get_include_dirs() is dirs
+
+
+def test_include_dirs_cache_file(tmpdir, monkeypatch):
+    cache_file = str(tmpdir.join('include_dirs.json'))
+    tmpdir = tmpdir.mkdir('root')
+    tmpdir.mkdir('a').mkdir('include')
+    tmpdir.mkdir('b')
+    use_templates(tmpdir, monkeypatch)
+    dirs = platform.get_include_dirs(cache_file)
+    assert os.path.exists(cache_file)
+
+    # Loaded from the cache, without globbing
+    monkeypatch.setattr(platform, '_include_dirs', None)
+    with monkeypatch.context() as m:
+        m.setattr(platform, 'fill_and_glob_dirs', None)
+        assert platform.get_include_dirs(cache_file) == dirs
+
+    # Invalidated by a change within one of the globbed dirs. Set the mtime explicitly, since it
+    # may not tick over otherwise on filesystems with coarse mtimes.
+    b_dir = str(tmpdir.join('b'))
+    old_mtime = os.stat(b_dir).st_mtime
+    tmpdir.join('b').mkdir('include')
+    os.utime(b_dir, (old_mtime + 10, old_mtime + 10))
+    monkeypatch.setattr(platform, '_include_dirs', None)
+    assert sorted(platform.get_include_dirs(cache_file)) == [str(tmpdir.join(d, 'include'))
+                                                             for d in ('a', 'b')]
+
+    # Any change of mtime invalidates it, even with no visible change in the contents
+    os.utime(b_dir, (old_mtime + 20, old_mtime + 20))
+    globbed = []
+    monkeypatch.setattr(platform, '_include_dirs', None)
+    with monkeypatch.context() as m:
+        m.setattr(platform, 'fill_and_glob_dirs',
+                  lambda templates: globbed.append(templates) or [])
+        platform.get_include_dirs(cache_file)
+    assert globbed
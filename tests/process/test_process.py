@@ -1,4 +1,5 @@
 from util import local_fpath
+from nicelib import process
 from nicelib.process import process_headers
 
 
@@ -24,3 +25,7 @@ def test_argnames():
 
     assert argnames['f_structa'] == ['a']
     assert argnames['f_structptra'] == ['a']
+
+
+def test_cparser_alias():
+    assert process.cparser is process.get_cparser()